@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
-import time
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from sqlalchemy import create_engine, text
+from sqlalchemy.orm import scoped_session, sessionmaker
 from io import BytesIO
 import altair as alt
 import plotly.express as px
@@ -14,6 +14,15 @@ import smtplib
 from email.mime.text import MIMEText
 import re
 import unicodedata
+import hashlib
+import hmac
+import os
+from pathlib import Path
+import base64
+import json
+import time
+import logging
+from streamlit_cookies_manager import CookieManager
 
 DB_URL = st.secrets["DB_URL"]
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD")  
@@ -22,8 +31,81 @@ KASIR_PASSWORDS = st.secrets["KASIR_PASSWORDS"]
 EMAIL = st.secrets["EMAIL"]
 APP_PASSWORD = st.secrets["APP_PASSWORD"]
 ADMIN_EMAIL = st.secrets["ADMIN_EMAIL"]
+# kunci tanda tangan cookie login seller; kosong = fitur cookie nonaktif
+COOKIE_SECRET = st.secrets.get("COOKIE_SECRET")
+
+def hash_password(pwd):
+    return hashlib.sha256((pwd or "").encode()).digest()
+
+# password dibandingkan lewat digest, bukan plaintext
+KASIR_HASHES = {hash_password(p): cabang for p, cabang in KASIR_PASSWORDS.items()}
+ADMIN_HASH = hash_password(ADMIN_PASSWORD) if ADMIN_PASSWORD else None
+
+@st.cache_resource
+def get_engine():
+    # satu pool untuk semua session, tidak dibuat ulang tiap rerun
+    return create_engine(
+        DB_URL,
+        future=True,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+        # buang koneksi lama sebelum diputus sepihak oleh server / proxy
+        pool_recycle=1800,
+        # query laporan yang kebablasan tidak boleh menahan koneksi pool
+        connect_args={"options": "-c statement_timeout=30000"},
+    )
+
+engine = get_engine()
+
+@st.cache_resource
+def get_session_factory():
+    # session per thread, dipakai ulang untuk query baca yang ringan
+    return scoped_session(sessionmaker(bind=get_engine(), autocommit=False, autoflush=False))
+
+# Query halaman login (register / login seller)
+# INSERT sekaligus cek ID: baris kosong berarti ID sudah terpakai
+INS_SELLER = text("""
+    INSERT INTO seller (nama_seller, no_hp, status, id_seller)
+    VALUES (:nama, :no_hp, :status, :id_seller)
+    ON CONFLICT ((UPPER(id_seller))) DO NOTHING
+    RETURNING id_seller
+""")
+# cadangan kalau ix_seller_id_upper belum ada (data lama berisi ID ganda):
+# ON CONFLICT butuh index arbiter, jadi cek NOT EXISTS di statement yang sama
+INS_SELLER_NO_INDEX = text("""
+    INSERT INTO seller (nama_seller, no_hp, status, id_seller)
+    SELECT :nama, :no_hp, :status, :id_seller
+    WHERE NOT EXISTS (
+        SELECT 1 FROM seller WHERE UPPER(id_seller) = UPPER(:id_seller)
+    )
+    RETURNING id_seller
+""")
+# memakai index ix_seller_id_upper; id_seller diambil dari DB (data lama bisa huruf kecil).
+# Tanpa index unik bisa ada varian huruf: yang persis sama didahulukan
+SEL_SELLER_LOGIN = text("""
+    SELECT id_seller, nama_seller, status FROM seller
+    WHERE UPPER(id_seller) = UPPER(:id)
+    ORDER BY (id_seller = :id) DESC, id_seller
+    LIMIT 1
+""")
+
+# ID seller: tepat 3 huruf kapital / angka (contoh: A01)
+SELLER_ID_RE = re.compile(r"^[A-Z0-9]{3}$")
+
+# status seller untuk memulihkan login dari cookie (ditolak/dihapus -> tidak lolos)
+SEL_SELLER_STATUS = text("""
+    SELECT status FROM seller
+    WHERE UPPER(id_seller) = UPPER(:id)
+    ORDER BY (id_seller = :id) DESC, id_seller
+    LIMIT 1
+""")
 
-engine = create_engine(DB_URL, future=True)
+@st.cache_data(ttl=60, show_spinner=False)
+def _seller_status(id_seller):
+    # TTL pendek: perubahan status oleh admin berlaku paling lambat 60 detik
+    with get_engine().connect() as conn:
+        return conn.execute(SEL_SELLER_STATUS, {"id": id_seller}).scalar()
 
 def init_db():
     try:
@@ -116,10 +198,100 @@ def init_db():
                 ADD COLUMN IF NOT EXISTS draft_id BIGINT UNIQUE;
             """))
 
+            # urutan tabel "Informasi Kupon" admin; ekspresi CASE harus
+            # sama persis dengan ORDER BY di _load_vouchers
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS voucher_admin_sort_idx
+                ON public.vouchers (
+                    (CASE
+                        WHEN seller IS NOT NULL AND seller <> '' THEN 1
+                        ELSE 2
+                    END),
+                    (CASE
+                        WHEN status = 'active' THEN 1
+                        WHEN status = 'habis' THEN 2
+                        WHEN status = 'proses' THEN 3
+                        WHEN status = 'inactive' THEN 4
+                        ELSE 5
+                    END),
+                    (CASE
+                        WHEN initial_value = 50000 THEN 1
+                        WHEN initial_value = 100000 THEN 2
+                        WHEN initial_value = 200000 THEN 3
+                        ELSE 4
+                    END),
+                    code
+                );
+            """))
+
+            # kupon milik seller (tab Kepemilikan Kupon)
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS voucher_seller_idx
+                ON public.vouchers (seller)
+                WHERE seller IS NOT NULL;
+            """))
+
+            # lookup kode kupon (cek kupon kasir, aktivasi & lacak seller)
+            # tidak peka huruf besar/kecil
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS voucher_code_upper_idx
+                ON public.vouchers (UPPER(code));
+            """))
+
+            # filter tanggal + cabang di tab Histori
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_transactions_tanggal_branch
+                ON public.transactions (tanggal_transaksi, branch);
+            """))
+
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS public.seller (
+                    id_seller TEXT,
+                    nama_seller TEXT,
+                    no_hp TEXT,
+                    status TEXT DEFAULT 'belum diterima'
+                );
+            """))
+
     except Exception as e:
         st.error(f"Gagal inisialisasi database: {e}")
         st.stop()
 
+# ID seller ganda dari data lama (registrasi dulu SELECT lalu INSERT),
+# termasuk yang hanya beda huruf besar/kecil ("a01" vs "A01")
+SEL_SELLER_DUPLIKAT = text("""
+    SELECT UPPER(id_seller) FROM public.seller
+    GROUP BY UPPER(id_seller) HAVING COUNT(*) > 1
+    ORDER BY 1 LIMIT 5
+""")
+
+@st.cache_resource(show_spinner=False)
+def ensure_seller_index():
+    """
+    Buat unique index UPPER(id_seller) sekali per proses: jadi arbiter
+    ON CONFLICT registrasi sekaligus index lookup login seller.
+    Sengaja di luar init_db dan tidak fatal: kalau data lama berisi ID ganda
+    index tidak dibuat, app tetap jalan dan registrasi memakai
+    INS_SELLER_NO_INDEX. Kembalikan True kalau index siap.
+    """
+    try:
+        with engine.begin() as conn:
+            dup = [r[0] for r in conn.execute(SEL_SELLER_DUPLIKAT)]
+            if dup:
+                logging.warning(
+                    "ix_seller_id_upper tidak dibuat, id_seller ganda: %s. "
+                    "Bereskan duplikat lalu restart app.", dup
+                )
+                return False
+            conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS ix_seller_id_upper
+                ON public.seller (UPPER(id_seller));
+            """))
+        return True
+    except Exception:
+        logging.warning("Gagal membuat ix_seller_id_upper", exc_info=True)
+        return False
+
 
 def aktivasi_notification(voucher_code, seller_name, buyer_name, buyer_phone):
     subject = f"[INFO] Voucher {voucher_code} Ingin Diaktivasi oleh Seller"
@@ -211,18 +383,21 @@ def daftar_notification(nama, nohp):
         print("Email error:", e)
         return False
 
+REDEEM_KEYS = frozenset({
+    "redeem_step",
+    "entered_code",
+    "order_items",
+    "checkout_total",
+    "isvoucher",
+    "voucher_row",
+    "newbal",
+    "show_success"
+})
+
 def reset_redeem_state():
-    for key in [
-        "redeem_step",
-        "entered_code",
-        "order_items",
-        "checkout_total",
-        "isvoucher",
-        "voucher_row",
-        "newbal",
-        "show_success"
-    ]:
-        st.session_state.pop(key, None)
+    # hanya hapus key yang memang ada
+    for key in REDEEM_KEYS.intersection(st.session_state.keys()):
+        del st.session_state[key]
 
 def show_back_to_login_button(role=""):
     st.markdown("---")
@@ -235,6 +410,9 @@ def show_back_to_login_button(role=""):
         # Reset page/page flags
         st.session_state.page = None
 
+        if role == "seller":
+            forget_seller_cookie()
+
         # Reset transaksi (jika kasir)
         if role == "kasir":
             reset_redeem_state()
@@ -242,17 +420,12 @@ def show_back_to_login_button(role=""):
         st.rerun()
 
 
-def generate_code(length=6):
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
+CODE_CHARS = string.ascii_uppercase + string.digits
 
-def kode_exists(kode):
-    with engine.connect() as conn:
-        r = conn.execute(
-            text("SELECT 1 FROM vouchers WHERE code = :c"),
-            {"c": kode}
-        ).fetchone()
-    return r is not None
+def generate_codes(n, length=6):
+    """n kode acak sekaligus (boleh ada yang sama, dedup di pemanggil)."""
+    semua = random.choices(CODE_CHARS, k=n * length)
+    return [''.join(semua[i:i + length]) for i in range(0, n * length, length)]
 
 
 def insert_jenis_if_not_exists(jenis, awal, akhir):
@@ -272,48 +445,81 @@ def insert_jenis_if_not_exists(jenis, awal, akhir):
             )
 
 
-def insert_voucher(code, initial_value, jenis, awal, akhir):
+# satu INSERT untuk sekumpulan kode; kode yang sudah ada dilewati oleh DB
+INS_VOUCHERS = text("""
+    INSERT INTO public.vouchers
+    (code, initial_value, balance, jenis_kupon, tanggal_penjualan, tanggal_aktivasi, status)
+    SELECT c, :iv, :iv, :jenis, :awal, :akhir, 'inactive'
+    FROM unnest(CAST(:codes AS TEXT[])) AS c
+    ON CONFLICT (code) DO NOTHING
+    RETURNING code
+""")
+
+def create_vouchers(jumlah, initial_value, jenis, awal, akhir, length=6):
+    """
+    Buat `jumlah` kupon baru dengan kode acak unik, return list kode.
+    Kode yang bentrok di DB diganti di putaran berikutnya.
+    """
+    created = []
     with engine.begin() as conn:
-        conn.execute(
-            text("""
-                INSERT INTO public.vouchers
-                (code, initial_value, balance, jenis_kupon, tanggal_penjualan, tanggal_aktivasi, status)
-                VALUES (:c, :iv, :bal, :jenis, :awal, :akhir, 'inactive')
-            """),
-            {
-                "c": code,
+        while len(created) < jumlah:
+            kandidat = set()
+            while len(kandidat) < jumlah - len(created):
+                kandidat.update(generate_codes(jumlah - len(created) - len(kandidat), length))
+            created += conn.execute(INS_VOUCHERS, {
+                "codes": list(kandidat),
                 "iv": initial_value,
-                "bal": initial_value,
                 "jenis": jenis,
                 "awal": awal,
                 "akhir": akhir
-            }
-        )
+            }).scalars().all()
+    clear_voucher_cache()
+    return created
+
+SEL_VOUCHER = text("""
+    SELECT 
+        v.code,
+        v.initial_value,
+        v.balance,
+        v.nama,
+        v.no_hp,
+        v.status,
+        v.seller,
+        v.tanggal_penjualan,
+        v.tanggal_aktivasi,
+        v.tunai,
+        v.jenis_kupon,
+        j.awal_berlaku,
+        j.akhir_berlaku,
+        -- hasil validasi redeem (urutan cek sama seperti validate_voucher_and_show_info)
+        CASE
+            WHEN j.awal_berlaku IS NULL OR j.akhir_berlaku IS NULL THEN 'no_period'
+            WHEN :today < j.awal_berlaku THEN 'not_yet'
+            WHEN :today > j.akhir_berlaku THEN 'expired'
+            WHEN LOWER(TRIM(COALESCE(v.status, ''))) = 'inactive' THEN 'inactive'
+            WHEN LOWER(TRIM(COALESCE(v.status, ''))) = 'habis'
+                 OR COALESCE(v.balance, 0) <= 0 THEN 'empty'
+            WHEN LOWER(TRIM(COALESCE(v.status, ''))) = 'proses' THEN 'pending'
+            WHEN LOWER(TRIM(COALESCE(v.status, ''))) <> 'active' THEN 'bad_status'
+            WHEN v.tanggal_aktivasi IS NULL THEN 'not_activated'
+            WHEN v.tanggal_aktivasi = :today THEN 'too_soon'
+            ELSE 'ok'
+        END AS redeem_state
+    FROM public.vouchers v
+    JOIN public.jenis_db j 
+      ON v.jenis_kupon = j.jenis_kupon
+    WHERE UPPER(v.code) = UPPER(:code)
+    -- voucher_code_upper_idx tidak unik: kalau ada varian huruf besar/kecil,
+    -- pilih yang persis sama dengan input, selain itu urut kode (tetap)
+    ORDER BY (v.code = :code) DESC, v.code
+    LIMIT 1
+""")
 
 def find_voucher(code):
     try:
         with engine.connect() as conn:
-            row = conn.execute(text("""
-                SELECT 
-                    v.code,
-                    v.initial_value,
-                    v.balance,
-                    v.nama,
-                    v.no_hp,
-                    v.status,
-                    v.seller,
-                    v.tanggal_penjualan,
-                    v.tanggal_aktivasi,
-                    v.tunai,
-                    v.jenis_kupon,
-                    j.awal_berlaku,
-                    j.akhir_berlaku
-                FROM public.vouchers v
-                JOIN public.jenis_db j 
-                  ON v.jenis_kupon = j.jenis_kupon
-                WHERE v.code = :code
-                LIMIT 1
-            """), {"code": code}).fetchone()
+            # :today dari app, bukan CURRENT_DATE (timezone DB bisa beda)
+            row = conn.execute(SEL_VOUCHER, {"code": code, "today": date.today()}).fetchone()
         return row
     except Exception as e:
         st.error(f"DB error saat cari voucher: {e}")
@@ -331,53 +537,99 @@ def update_voucher_detail(code, nama, no_hp, status, tanggal_aktivasi):
                     tanggal_aktivasi = :tanggal_aktivasi
                 WHERE code = :code
             """), {"nama": nama, "no_hp": no_hp, "status": status, "tanggal_aktivasi": tanggal_aktivasi, "code": code})
+        clear_voucher_cache()
         return True
     except Exception as e:
         st.error(f"Gagal update voucher: {e}")
         return False
     
+# kolom counter "terjual" per cabang (whitelist untuk f-string UPDATE)
+TERJUAL_COLS = {
+    "tawangsari": "terjual_twsari",
+    "sedati": "terjual_sedati",
+    "kesambi": "terjual_kesambi",
+    "seller": "terjual_seller"
+}
+
+# statement UPDATE terjual per cabang, dibuat sekali saat modul dimuat
+UPD_TERJUAL = {
+    branch: text(f"""
+        UPDATE public.menu_items
+        SET {col} = COALESCE({col}, 0) + :qty
+        WHERE nama_item = :item
+    """)
+    for branch, col in TERJUAL_COLS.items()
+}
+
+INS_DRAFT = text("""
+    INSERT INTO public.transactions_draft
+    (code, used_amount, tanggal_transaksi, branch, items, tunai, isvoucher, diskon)
+    VALUES (:c, :amt, :now, :branch, :items, :tunai, :isvoucher, :diskon)
+""")
+
+SEL_VOUCHER_FOR_UPDATE = text("""
+    SELECT balance, COALESCE(tunai, 0)
+    FROM public.vouchers
+    WHERE code = :c AND status = 'active'
+    FOR UPDATE
+""")
+
+UPD_VOUCHER_BALANCE = text("""
+    UPDATE public.vouchers
+    SET balance = :newbal,
+        status = :newstatus,
+        tunai = :newtunai
+    WHERE code = :c
+""")
+
+def parse_redeem_items(items_str):
+    """
+    "Nama x2, Nama2 x0.5" -> [("Nama", 2.0), ("Nama2", 0.5)]
+    Raise ValueError kalau qty tidak bisa dibaca.
+    """
+    parsed = []
+    for i in (items_str or "").split(","):
+        i = i.strip()
+        if " x" not in i:
+            continue
+        nama_item, qty = i.rsplit(" x", 1)
+        parsed.append((nama_item, float(qty)))
+    return parsed
+
 def atomic_redeem(code, amount, branch, items_str, diskon):
+    # validasi murah dulu sebelum buka transaksi & lock row voucher
+    update_terjual = UPD_TERJUAL.get((branch or "").lower())
+    if update_terjual is None:
+        return False, f"Cabang '{branch}' tidak dikenali.", None
+
+    if amount is None or amount < 0:
+        return False, "Total transaksi tidak valid.", None
+
+    try:
+        parsed = parse_redeem_items(items_str)
+    except ValueError:
+        return False, "Format item transaksi tidak valid.", None
+
+    if amount == 0 and not parsed:
+        return False, "Tidak ada item untuk diproses.", None
+
     try:
         if code is None:
             with engine.begin() as conn:
-                conn.execute(text("""
-                    INSERT INTO public.transactions_draft
-                    (code, used_amount, tanggal_transaksi, branch, items, tunai, isvoucher, diskon)
-                    VALUES (NULL, :used_amount, :now, :branch, :items, :tunai, 'no', :diskon)
-                """), {
+                conn.execute(INS_DRAFT, {
+                    "c": None,
+                    "amt": amount,
                     "now": datetime.utcnow(),
                     "branch": branch,
                     "items": items_str,
-                    "used_amount": amount,
                     "tunai": amount,
+                    "isvoucher": "no",
                     "diskon": diskon
                 })
 
                 # UPDATE TERJUAL MENU
-                items = [x.strip() for x in items_str.split(",")]
-
-                mapping = {
-                    "tawangsari": "terjual_twsari",
-                    "sedati": "terjual_sedati",
-                    "kesambi": "terjual_kesambi",
-                    "seller": "terjual_seller"
-                }
-
-                col = mapping.get(branch.lower())
-                if not col:
-                    return False, f"Cabang '{branch}' tidak dikenali.", None
-
-                for i in items:
-                    if " x" not in i:
-                        continue
-                    nama_item, qty = i.split(" x")
-                    qty = float(qty)
-
-                    conn.execute(text(f"""
-                        UPDATE public.menu_items
-                        SET {col} = COALESCE({col}, 0) + :qty
-                        WHERE nama_item = :item
-                    """), {"qty": qty, "item": nama_item})
+                for nama_item, qty in parsed:
+                    conn.execute(update_terjual, {"qty": qty, "item": nama_item})
 
                 return True, "Transaksi cash berhasil 💸 (draft)", None
 
@@ -386,12 +638,7 @@ def atomic_redeem(code, amount, branch, items_str, diskon):
         # =====================================================
         else:
             with engine.begin() as conn:
-                r = conn.execute(text("""
-                    SELECT balance, COALESCE(tunai, 0)
-                    FROM public.vouchers
-                    WHERE code = :c AND status = 'active'
-                    FOR UPDATE
-                """), {"c": code}).fetchone()
+                r = conn.execute(SEL_VOUCHER_FOR_UPDATE, {"c": code}).fetchone()
 
                 if not r:
                     return False, "Voucher tidak ditemukan.", None
@@ -411,13 +658,7 @@ def atomic_redeem(code, amount, branch, items_str, diskon):
 
                 new_status = "habis" if new_balance == 0 else "active"
 
-                conn.execute(text("""
-                    UPDATE public.vouchers
-                    SET balance = :newbal,
-                        status = :newstatus,
-                        tunai = :newtunai
-                    WHERE code = :c
-                """), {
+                conn.execute(UPD_VOUCHER_BALANCE, {
                     "newbal": new_balance,
                     "newstatus": new_status,
                     "newtunai": tunai_existing + shortage,
@@ -425,45 +666,20 @@ def atomic_redeem(code, amount, branch, items_str, diskon):
                 })
 
                 # SIMPAN TRANSAKSI KE DRAFT
-                conn.execute(text("""
-                    INSERT INTO public.transactions_draft
-                    (code, used_amount, tanggal_transaksi, branch, items, tunai, isvoucher, diskon)
-                    VALUES (:c, :amt, :now, :branch, :items, :tunai, 'yes', :diskon)
-                """), {
+                conn.execute(INS_DRAFT, {
                     "c": code,
                     "amt": amount,
                     "now": datetime.utcnow(),
                     "branch": branch,
                     "items": items_str,
                     "tunai": shortage,
+                    "isvoucher": "yes",
                     "diskon": diskon
                 })
 
                 # UPDATE TERJUAL MENU
-                items = [x.strip() for x in items_str.split(",")]
-
-                mapping = {
-                    "tawangsari": "terjual_twsari",
-                    "sedati": "terjual_sedati",
-                    "kesambi": "terjual_kesambi",
-                    "seller": "terjual_seller"
-                }
-
-                col = mapping.get(branch.lower())
-                if not col:
-                    return False, f"Cabang '{branch}' tidak dikenali.", None
-
-                for i in items:
-                    if " x" not in i:
-                        continue
-                    nama_item, qty = i.split(" x")
-                    qty = float(qty)
-
-                    conn.execute(text(f"""
-                        UPDATE public.menu_items
-                        SET {col} = COALESCE({col}, 0) + :qty
-                        WHERE nama_item = :item
-                    """), {"qty": qty, "item": nama_item})
+                for nama_item, qty in parsed:
+                    conn.execute(update_terjual, {"qty": qty, "item": nama_item})
 
                 return True, "Redeem berhasil ✅ (draft)", new_balance
 
@@ -491,6 +707,33 @@ def list_transactions_draft(engine, tanggal=None, branch="Semua"):
     with engine.connect() as conn:
         return pd.read_sql(text(q), conn, params=params)
 
+# riwayat kasir: kolom yang tampil saja, NULL dibereskan di SQL
+SEL_RIWAYAT_DRAFT = """
+    SELECT
+        id,
+        tanggal_transaksi::date AS tanggal_transaksi,
+        branch,
+        items,
+        CAST(COALESCE(used_amount, 0) AS DOUBLE PRECISION) AS used_amount,
+        CAST(COALESCE(tunai, 0) AS DOUBLE PRECISION) AS tunai,
+        COALESCE(isvoucher, 'no') AS isvoucher,
+        COALESCE(code, '') AS code,
+        CAST(COALESCE(diskon, 0) AS DOUBLE PRECISION) AS diskon
+    FROM public.transactions_draft
+    WHERE is_locked = false
+"""
+
+def list_riwayat_draft(engine, branch="Semua"):
+    q = SEL_RIWAYAT_DRAFT
+    params = {}
+    if branch and branch != "Semua":
+        q += " AND branch = :branch"
+        params["branch"] = branch
+    q += " ORDER BY id DESC"
+
+    with engine.connect() as conn:
+        return pd.read_sql(text(q), conn, params=params)
+
 def update_transaction_draft(engine, draft_id, data: dict):
     # data keys harus sesuai kolom
     sql = """
@@ -541,6 +784,7 @@ def lock_one_draft_to_final(engine, draft_id, locked_by="admin"):
             SET is_locked=true, locked_at=NOW(), locked_by=:by, updated_at=NOW()
             WHERE id=:id
         """), {"id": int(draft_id), "by": locked_by})
+    clear_voucher_cache()
 
 def lock_all_draft_by_date(engine, tanggal: date, branch="Semua", locked_by="admin"):
     """
@@ -554,29 +798,77 @@ def lock_all_draft_by_date(engine, tanggal: date, branch="Semua", locked_by="adm
 
 
 
-def list_vouchers(filter_status=None, search=None, limit=5000, offset=0):
-    q = "SELECT v.code, v.initial_value, v.balance, v.nama, v.no_hp, v.status, v.seller, v.tanggal_aktivasi, j.awal_berlaku, j.akhir_berlaku FROM public.vouchers v JOIN public.jenis_db j ON v.jenis_kupon = j.jenis_kupon"
-    clauses = []
+# pilihan "Cari berdasarkan" -> kolom vouchers (whitelist untuk f-string)
+SEARCH_COLS = {"Kode": "code", "Nama Seller": "seller", "Nama Pembeli": "nama"}
+
+# badge status di tabel Informasi Kupon; selain ini -> "⚪ inactive"
+STATUS_BADGE = {
+    "active": "🟢 active",
+    "Active": "🟢 active",
+    "habis": "🔴 habis",
+    "sold out": "🔴 habis",
+    "proses": "🟡 proses",
+}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_vouchers(filter_status, filter_nominal, cari_berdasarkan, kode_cari):
+    # tabel "Informasi Kupon" admin; di-cache per kombinasi filter
+    # hanya kolom yang ditampilkan / dipakai form edit
+    # match_u: kolom pencarian yang sudah di-UPPER oleh DB, dipakai
+    # untuk cocok persis (form edit) tanpa upper per baris di pandas
+    search_col = SEARCH_COLS.get(cari_berdasarkan, "code")
+    query = f"""
+        SELECT code, nama, no_hp, status, tanggal_aktivasi,
+               initial_value, balance, tunai, seller, tanggal_penjualan,
+               UPPER({search_col}) AS match_u
+        FROM vouchers
+    """
+    where_conditions = []
     params = {}
-    if filter_status == "aktif":
-        clauses.append("status ILIKE 'active'")
-    elif filter_status == "habis":
-        clauses.append("balance = 0")
-    if search:
-        clauses.append("code ILIKE :search")
-        params["search"] = f"%{search}%"
-    if clauses:
-        q += " WHERE " + " AND ".join(clauses)
-    q += " ORDER BY awal_berlaku DESC LIMIT :limit OFFSET :offset"
-    params["limit"] = limit
-    params["offset"] = offset
+
+    # Filter status
+    if filter_status != "semua":
+        where_conditions.append("status = :status")
+        params["status"] = filter_status
+
+    # Filter kode
+    if kode_cari:
+        where_conditions.append(f"UPPER({search_col}) LIKE :val")
+        params["val"] = f"%{kode_cari.upper()}%"
+
+    # Filter nominal
+    if filter_nominal != "semua":
+        where_conditions.append("initial_value = :nominal")
+        params["nominal"] = int(filter_nominal)
+
+    # Gabungkan SQL final
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    query += """
+     ORDER BY 
+         CASE 
+            WHEN seller IS NOT NULL AND seller <> '' THEN 1
+            ELSE 2
+        END,
+        CASE 
+            WHEN status = 'active' THEN 1
+            WHEN status = 'habis' THEN 2
+            WHEN status = 'proses' THEN 3
+            WHEN status = 'inactive' THEN 4
+            ELSE 5
+        END,
+        CASE
+            WHEN initial_value = 50000 THEN 1
+            WHEN initial_value = 100000 THEN 2
+            WHEN initial_value = 200000 THEN 3
+            ELSE 4
+        END,
+        code ASC
+    """
+
     with engine.connect() as conn:
-        df = pd.read_sql(text(q), conn, params=params)
-    if "status" in df.columns:
-        df["status"] = df["status"].fillna("inactive")
-    else:
-        df["status"] = "inactive"
-    return df
+        return pd.read_sql(text(query), conn, params=params)
 
 def to_int_or_none(value):
     if value in ("", None):
@@ -598,15 +890,29 @@ def to_upper_or_none(value: str):
     value = value.strip()
     return value.upper() if value != "" else None
     
-def list_all_menu():
+@st.cache_data(ttl=300, max_entries=1, show_spinner=False)
+def _fetch_all_menu():
     query = """
         SELECT * FROM public.menu_items
         ORDER BY kategori, nama_item
     """
-    with engine.begin() as conn:
+    with engine.connect() as conn:
         res = conn.execute(text(query)).mappings().all()
-    return res
+    return [dict(r) for r in res]
+
+def list_all_menu():
+    """
+    Semua menu sebagai list of dict, diakses lewat nama kolom
+    (m["id_menu"], m["harga_sedati"], ...), bukan posisi kolom.
+    """
+    # error tidak ikut di-cache: exception di _fetch_all_menu tidak disimpan
+    try:
+        return _fetch_all_menu()
+    except Exception as e:
+        st.error(f"Error saat mengambil menu: {e}")
+        return []
 
+@st.cache_data(ttl=300, show_spinner=False)
 def list_all_kategori():
     query = """
         SELECT * FROM public.kategori_menu
@@ -614,7 +920,7 @@ def list_all_kategori():
     """
     with engine.begin() as conn:
         res = conn.execute(text(query)).mappings().all()
-    return res
+    return [dict(r) for r in res]
 
 def add_menu_item(kategori, nama_item, keterangan,
                   harga_sedati, harga_twsari, harga_kesambi, harga_seller, satuan):
@@ -643,6 +949,8 @@ def add_menu_item(kategori, nama_item, keterangan,
     with engine.begin() as conn:
         conn.execute(text(query), params)
 
+    clear_menu_cache()
+
 
 def update_menu_item(id_menu, kategori, nama_item, keterangan,
                      harga_sedati, harga_twsari, harga_kesambi, harga_seller, status, satuan):
@@ -677,6 +985,8 @@ def update_menu_item(id_menu, kategori, nama_item, keterangan,
     with engine.begin() as conn:
         conn.execute(text(query), params)
 
+    clear_menu_cache()
+
 def update_kategori_menu(id_kategori, status_kategori):
     query = """
         UPDATE public.kategori_menu 
@@ -692,17 +1002,32 @@ def update_kategori_menu(id_kategori, status_kategori):
     with engine.begin() as conn:
         conn.execute(text(query), params)
 
+    # kategori jarang berubah, jadi di-cache; buang cache setiap ada update
+    list_all_kategori.clear()
+    clear_menu_cache()
+
 def delete_menu_item(id_menu):
     try:
         with engine.begin() as conn:
             conn.execute(text("""
                 DELETE FROM public.menu_items WHERE id_menu = :id_menu
             """), {"id_menu": id_menu})
+        clear_menu_cache()
         return True
     except Exception as e:
         st.error(f"Error saat menghapus menu: {e}")
         return False
 
+def clear_menu_cache():
+    # dipanggil setiap ada tulis ke menu_items
+    _fetch_all_menu.clear()
+    _fetch_menu_kategori.clear()
+    _build_menu.clear()
+    _build_menu_index.clear()
+    get_full_menu.clear()
+    get_kategori_list.clear()
+
+@st.cache_data(ttl=300, show_spinner=False)
 def get_kategori_list():
     query = text("""
         SELECT DISTINCT kategori
@@ -711,46 +1036,13 @@ def get_kategori_list():
         ORDER BY kategori
     """)
     with engine.begin() as conn:
-        rows = conn.execute(query).fetchall()
-    # ambil kolom pertama dari tiap row jadi list
-    return [r[0] for r in rows]
-
-def list_all_menu():
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT *
-                FROM public.menu_items
-                ORDER BY kategori, nama_item
-            """))
+        return conn.execute(query).scalars().all()
 
-            rows = result.fetchall()
-
-            menu_list = []
-            for r in rows:
-                menu_list.append({
-                    "id_menu": r[7],
-                    "kategori": r[0],
-                    "nama_item": r[1],
-                    "keterangan": r[2],
-                    "harga_sedati": r[3],
-                    "harga_twsari": r[4],
-                    "harga_kesambi" : r[8],
-                    "harga_seller" : r[10],
-                    "status" : r[12],
-                    "satuan" : r[13]
-                })
-
-            return menu_list
-
-    except Exception as e:
-        st.error(f"Error saat mengambil menu: {e}")
-        return []
-
-def get_menu_from_db(branch):
-    try:
-        with engine.connect() as conn:
-            df = pd.read_sql(text("""
+@st.cache_data(ttl=300, max_entries=1, show_spinner=False)
+def _fetch_menu_kategori():
+    # satu query untuk semua cabang; harga cabang dipilih di get_menu_from_db
+    with engine.connect() as conn:
+        return pd.read_sql(text("""
                 SELECT 
                     m.id_menu,
                     m.kategori,
@@ -768,47 +1060,71 @@ def get_menu_from_db(branch):
                     ON m.kategori = k.nama_kategori
             """), conn)
 
-        df = df[
-            (df["status_kategori"].isna()) |
-            (df["status_kategori"].str.lower() == "aktif")
-        ]
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def _build_menu(branch):
+    # list menu per cabang ikut di-cache, bukan hanya hasil query-nya
+    df = _fetch_menu_kategori()
+
+    df = df[
+        (df["status_kategori"].isna()) |
+        (df["status_kategori"].str.lower() == "aktif")
+    ]
+
+    mapping_harga = {
+        "Tawangsari": "harga_twsari",
+        "Sedati": "harga_sedati",
+        "Kesambi": "harga_kesambi",
+        "Seller": "harga_seller"
+    }
+    harga_col = mapping_harga.get(branch)
+    if not harga_col:
+        return []
 
-        mapping_harga = {
-            "Tawangsari": "harga_twsari",
-            "Sedati": "harga_sedati",
-            "Kesambi": "harga_kesambi",
-            "Seller": "harga_seller"
-        }
-        harga_col = mapping_harga.get(branch)
-        if not harga_col:
-            return []
+    menu_list = []
+    for _, row in df.iterrows():
+        id_menu = row["id_menu"]
+        harga = row[harga_col]
 
-        menu_list = []
-        for _, row in df.iterrows():
-            id_menu = row["id_menu"]
-            harga = row[harga_col]
+        # Hindari error cannot convert nan to int
+        if pd.isna(id_menu) or pd.isna(harga):
+            continue
 
-            # Hindari error cannot convert nan to int
-            if pd.isna(id_menu) or pd.isna(harga):
-                continue
+        nama = str(row["nama_item"])
+        menu_list.append({
+            "id_menu": int(id_menu),
+            "nama": nama,
+            # huruf kecil disiapkan sekali (ikut cache) untuk pencarian kasir
+            "nama_lower": nama.lower(),
+            "harga": int(harga),
+            "kategori": str(row["kategori"]) if row["kategori"] is not None else "Lainnya",
+            "keterangan": "" if row["keterangan"] is None else str(row["keterangan"]),
+            "status": str(row["status"]),
+            "status_kategori": row["status_kategori"],
+            "satuan": row["satuan"]
+        })
+
+    return menu_list
 
-            menu_list.append({
-                "id_menu": int(id_menu),
-                "nama": str(row["nama_item"]),
-                "harga": int(harga),
-                "kategori": str(row["kategori"]) if row["kategori"] is not None else "Lainnya",
-                "keterangan": "" if row["keterangan"] is None else str(row["keterangan"]),
-                "status": str(row["status"]),
-                "status_kategori": row["status_kategori"],
-                "satuan": row["satuan"]
-            })
+def get_menu_from_db(branch):
+    try:
+        return _build_menu(branch)
+    except Exception as e:
+        print("DB error:", e)
+        return []
 
-        return menu_list
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def _build_menu_index(branch):
+    # id_menu -> (nama, harga), dipakai hitung total kasir tiap rerun
+    return {m["id_menu"]: (m["nama"], m["harga"]) for m in _build_menu(branch)}
 
+def get_menu_index(branch):
+    try:
+        return _build_menu_index(branch)
     except Exception as e:
         print("DB error:", e)
-        return []
+        return {}
 
+@st.cache_data(ttl=300, max_entries=1, show_spinner=False)
 def get_full_menu():
     query = """
         SELECT 
@@ -851,6 +1167,164 @@ def count_vouchers(filter_status=None, search=None):
     with engine.connect() as conn:
         return int(conn.execute(text(q), params).scalar())
     
+# kolom teks transaksi: jangan ditebak tipenya oleh read_csv
+# (kode "012345" bisa jadi int, "1E5432" jadi float)
+TX_TEXT_COLS = ("code", "items", "branch", "isvoucher")
+
+def read_sql_copy(query, params=None, parse_dates=None, text_cols=TX_TEXT_COLS):
+    """
+    Baca hasil query lewat COPY ... TO STDOUT (CSV) lalu pd.read_csv.
+    Untuk hasil besar jauh lebih cepat dari fetch baris per baris.
+    Query tidak boleh diakhiri ';'. Kolom di text_cols dibaca sebagai str;
+    hanya field kosong (NULL) yang jadi NaN, bukan "NA"/"null" dsb.
+    """
+    buf = copy_csv(query, params)
+    buf.seek(0)
+    return pd.read_csv(
+        buf,
+        parse_dates=parse_dates,
+        dtype={c: str for c in text_cols},
+        keep_default_na=False,
+        na_values=[""],
+    )
+
+def copy_csv(query, params=None):
+    """Hasil query sebagai CSV (dengan header) di BytesIO, langsung dari COPY."""
+    compiled = text(query).compile(dialect=engine.dialect)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            sql = cur.mogrify(str(compiled), compiled.construct_params(params or {})).decode()
+            buf = BytesIO()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH CSV HEADER", buf)
+        return buf
+    finally:
+        raw.close()
+
+# loader untuk tab laporan; di-cache supaya tiap rerun widget
+# (ganti tanggal / cabang) tidak query ulang ke database
+@st.cache_data(ttl=300, max_entries=1, show_spinner=False)
+def load_vouchers_csv():
+    """Seluruh tabel kupon sebagai bytes CSV siap unduh (yang di-cache bytes-nya)."""
+    # CSV dari Postgres langsung, tanpa lewat DataFrame; used_value dihitung di SELECT
+    return copy_csv("""
+        SELECT *, COALESCE(initial_value, 0) - COALESCE(balance, 0) AS used_value
+        FROM public.vouchers
+    """).getvalue()
+
+@st.cache_data(ttl=300, max_entries=4, show_spinner=False)
+def load_voucher_summary():
+    """Jumlah, kupon habis, dan saldo per status kupon; dihitung di DB."""
+    query = """
+        SELECT
+            status,
+            COUNT(*) AS jumlah,
+            COUNT(*) FILTER (WHERE COALESCE(balance, 0) <= 0) AS habis,
+            COALESCE(SUM(balance), 0) AS saldo,
+            COALESCE(SUM(COALESCE(initial_value, 0) - COALESCE(balance, 0)), 0) AS terpakai
+        FROM public.vouchers
+        GROUP BY status
+    """
+    with engine.connect() as conn:
+        return pd.read_sql(text(query), conn)
+
+# transaksi kupon = isvoucher 'yes' (selain itu dihitung non kupon)
+IS_KUPON_SQL = "LOWER(TRIM(COALESCE(isvoucher, ''))) = 'yes'"
+
+def _laporan_tx_where(start, end, branch="Semua", kupon="Semua"):
+    """WHERE + params filter tab Laporan (tanggal akhir inklusif)."""
+    clauses = ["tanggal_transaksi >= :a", "tanggal_transaksi < :b"]
+    params = {"a": start, "b": end + timedelta(days=1)}
+    if branch != "Semua":
+        clauses.append("branch = :br")
+        params["br"] = branch
+    if kupon != "Semua":
+        clauses.append(f"({IS_KUPON_SQL}) = :v")
+        params["v"] = kupon == "Kupon"
+    return " AND ".join(clauses), params
+
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def load_transactions(start, end, branch="Semua", kupon="Semua"):
+    """Transaksi untuk tab Laporan, filter tanggal/cabang/kupon langsung di SQL."""
+    where, params = _laporan_tx_where(start, end, branch, kupon)
+    query = f"""
+        SELECT id, code, used_amount, tanggal_transaksi, branch,
+               items, tunai, isvoucher, diskon,
+               ({IS_KUPON_SQL})::int AS isvoucher_norm
+        FROM public.transactions
+        WHERE {where}
+    """
+    df = read_sql_copy(query, params, parse_dates=["tanggal_transaksi"])
+    # kolom berkardinalitas kecil -> category (sama seperti _load_tx)
+    return df.astype({"branch": "category", "isvoucher": "category", "isvoucher_norm": "int8"})
+
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def load_transactions_csv(start, end, branch="Semua", kupon="Semua"):
+    # bytes CSV ikut di-cache per filter (kunci = argumen, bukan hash frame)
+    return df_to_csv_bytes(load_transactions(start, end, branch, kupon))
+
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def load_tx_laporan_agg(start, end, branch="Semua", kupon="Semua"):
+    """Agregat per cabang & top 5 kupon tab Transaksi, di-group di DB."""
+    where, params = _laporan_tx_where(start, end, branch, kupon)
+    with engine.connect() as conn:
+        per_cabang = pd.read_sql(text(f"""
+            SELECT
+                branch AS "Cabang",
+                COUNT(*) AS "Jumlah Transaksi",
+                COALESCE(SUM(used_amount), 0) AS "Total Nominal"
+            FROM public.transactions
+            WHERE {where} AND branch IS NOT NULL
+            GROUP BY branch
+            ORDER BY branch
+        """), conn, params=params)
+        top_voucher = pd.read_sql(text(f"""
+            SELECT code, COUNT(*) AS "Jumlah Transaksi"
+            FROM public.transactions
+            WHERE {where} AND {IS_KUPON_SQL}
+              AND code IS NOT NULL AND code <> ''
+            GROUP BY code
+            ORDER BY 2 DESC, code
+            LIMIT 5
+        """), conn, params=params)
+    return per_cabang, top_voucher
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_seller_status():
+    """Jumlah kupon per seller & status (sold out -> habis), di-group di DB."""
+    # status NULL dihitung 'inactive', sama seperti dulu (list_vouchers
+    # mengisi fillna("inactive") sebelum astype(str)); bedanya sekarang semua
+    # kupon ikut dihitung, tanpa batas 5000 baris
+    query = """
+        SELECT
+            seller,
+            CASE
+                WHEN LOWER(COALESCE(status, 'inactive')) = 'sold out' THEN 'habis'
+                ELSE LOWER(COALESCE(status, 'inactive'))
+            END AS status_clean,
+            COUNT(*) AS n
+        FROM public.vouchers
+        WHERE seller IS NOT NULL AND seller <> '-'
+        GROUP BY 1, 2
+    """
+    with engine.connect() as conn:
+        return pd.read_sql(text(query), conn)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_tx_filter_options():
+    """Rentang tanggal & daftar cabang untuk filter tab Transaksi."""
+    with engine.connect() as conn:
+        tgl_min, tgl_max = conn.execute(text("""
+            SELECT MIN(tanggal_transaksi)::date, MAX(tanggal_transaksi)::date
+            FROM public.transactions
+        """)).one()
+        cabang = conn.execute(text("""
+            SELECT DISTINCT branch FROM public.transactions
+            WHERE branch IS NOT NULL
+            ORDER BY branch
+        """)).scalars().all()
+    return tgl_min, tgl_max, list(cabang)
+
 def run_query(query, params=None):
     with engine.connect() as conn:
         if params:
@@ -860,7 +1334,30 @@ def run_query(query, params=None):
         return pd.DataFrame(result.fetchall(), columns=result.keys())
 
 
-def list_transactions(limit=5000):
+def _tx_filter_sql(start, end, branch="semua", isvoucher=None, code=""):
+    """
+    WHERE + params filter tab Histori (dipakai _load_tx & _load_tx_totals).
+    end inklusif (tanggal_transaksi bertipe TIMESTAMP).
+    """
+    clauses = ["t.tanggal_transaksi >= :s", "t.tanggal_transaksi < :e"]
+    params = {"s": start, "e": end + timedelta(days=1)}
+    if branch != "semua":
+        clauses.append("t.branch = :b")
+        params["b"] = branch
+    if isvoucher:
+        clauses.append("COALESCE(t.isvoucher, 'no') = :v")
+        params["v"] = isvoucher
+    if code:
+        clauses.append("COALESCE(t.isvoucher, 'no') = 'yes'")
+        clauses.append("UPPER(t.code) LIKE :k")
+        params["k"] = f"%{code.upper()}%"
+    return " AND ".join(clauses), params
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_tx(start, end, branch="semua", isvoucher=None, code="", limit=5000):
+    """Transaksi final untuk tab Histori, filter langsung di SQL."""
+    where, params = _tx_filter_sql(start, end, branch, isvoucher, code)
+    params["lim"] = limit
     query = f"""
         SELECT 
             t.id,
@@ -876,16 +1373,59 @@ def list_transactions(limit=5000):
             v.balance
         FROM public.transactions t
         LEFT JOIN public.vouchers v ON t.code = v.code
-        ORDER BY t.tanggal_transaksi DESC
-        LIMIT {limit};
+        WHERE {where}
+        ORDER BY t.id DESC
+        LIMIT :lim
+    """
+    df = read_sql_copy(query, params, parse_dates=["tanggal_transaksi"])
+
+    # normalisasi sekali per fetch (ikut ter-cache), bukan tiap rerun
+    df["tanggal_transaksi"] = pd.to_datetime(df["tanggal_transaksi"]).dt.date
+    df["code"] = df["code"].fillna("")
+    df["isvoucher"] = df["isvoucher"].fillna("no")
+    df["diskon"] = pd.to_numeric(df["diskon"], errors="coerce").fillna(0)
+    # kolom berkardinalitas kecil -> category (lebih hemat & cepat untuk ==)
+    return df.astype({"branch": "category", "isvoucher": "category"})
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_tx_totals(start, end, branch="semua", isvoucher=None, code=""):
+    """Ringkasan (jumlah & total) transaksi sesuai filter Histori, dihitung di DB."""
+    where, params = _tx_filter_sql(start, end, branch, isvoucher, code)
+    query = f"""
+        SELECT
+            COUNT(*) AS n,
+            COALESCE(SUM(t.used_amount), 0) AS total_uang,
+            COALESCE(SUM(t.tunai), 0) AS total_cash,
+            COALESCE(SUM(t.diskon), 0) AS total_diskon,
+            (ARRAY_AGG(v.initial_value ORDER BY t.id DESC))[1] AS initial_value
+        FROM public.transactions t
+        LEFT JOIN public.vouchers v ON t.code = v.code
+        WHERE {where}
     """
-    return run_query(query)
+    with engine.connect() as conn:
+        return dict(conn.execute(text(query), params).mappings().one())
+
+def clear_voucher_cache():
+    # dipanggil setiap ada tulis ke vouchers / transactions
+    _load_vouchers.clear()
+    _load_tx.clear()
+    _load_tx_totals.clear()
+    load_vouchers_csv.clear()
+    load_voucher_summary.clear()
+    load_transactions.clear()
+    load_transactions_csv.clear()
+    load_tx_laporan_agg.clear()
+    load_tx_filter_options.clear()
+    load_seller_status.clear()
+    _lookup_voucher.clear()
+    # kolom terjual_* di menu_items ikut berubah saat redeem
+    get_full_menu.clear()
 
 def df_to_csv_bytes(df: pd.DataFrame):
     buf = BytesIO()
-    df.to_csv(buf, index=False)
-    buf.seek(0)
-    return buf.read()
+    # tulis langsung ke buffer bytes, tanpa string CSV perantara
+    df.to_csv(buf, index=False, encoding="utf-8")
+    return buf.getvalue()
 
 def serialize_items(items):
     return ", ".join(
@@ -972,8 +1512,7 @@ def ensure_session_state():
     }
 
     for k, v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
+        st.session_state.setdefault(k, v)
 
 def get_last_draft_date(engine, branch=None):
     q = """
@@ -995,6 +1534,7 @@ def admin_logout():
 
 
 def seller_logout():
+    forget_seller_cookie()
     st.session_state.seller_logged_in = False
     st.session_state.id_seller = None
     st.session_state.nama_seller = None
@@ -1011,155 +1551,190 @@ def kasir_logout():
 # INITIALIZE
 # ============================================================
 init_db()
+ensure_seller_index()
 ensure_session_state()
 
 st.set_page_config(page_title="Pawon Sappitoe", layout="wide", page_icon="❄️") 
 
+def render_html(html):
+    # st.html (streamlit>=1.40 di requirements.txt)
+    st.html(html)
+
+# template HTML halaman login (judul section, label input, jarak)
+SPACER = "<div style='height: 1rem;'></div>"
+HDR = "<h5 style='color: #FFFFFF; margin-bottom: 10px;'>{}</h5>"
+LBL = "<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>{}</h5>"
+
+def labeled_input(html_label, label, **kwargs):
+    # label custom (HTML) di atas text_input, label bawaan disembunyikan
+    render_html(html_label)
+    return st.text_input(label, label_visibility="collapsed", **kwargs)
+
+THEME_CSS_PATH = Path(__file__).parent / "static" / "blue_theme.css"
+KASIR_CSS_PATH = Path(__file__).parent / "static" / "kasir_theme.css"
+
+@st.cache_data(show_spinner=False)
+def _load_css(path: str, mtime: float) -> str:
+    # mtime ikut jadi key cache: file diedit -> otomatis dibaca ulang
+    return f"<style>\n{Path(path).read_text(encoding='utf-8')}</style>"
+
 def inject_blue_theme():
-    st.markdown("""
-    <style>
-        /* IMPORT FONT FUTURISTIK (TETAP SAMA) */
-        @import url('https://fonts.googleapis.com/css2?family=Outfit:wght@300;500;800&display=swap');
-        
-        html, body, [class*="css"] {
-            font-family: 'Outfit', sans-serif;
-        }
+    # tetap dikirim tiap rerun: elemen yang tidak di-render ulang
+    # akan dibuang Streamlit, jadi tema ikut hilang
+    render_html(_load_css(str(THEME_CSS_PATH), os.path.getmtime(THEME_CSS_PATH)))
 
-        /* ============================================================
-           FIX PENTING UNTUK HP (SUPAYA INPUT TIDAK JADI PUTIH/SILAU)
-           ============================================================ */
-        :root {
-            color-scheme: dark; /* Memaksa mode gelap untuk elemen browser */
-        }
+# ============================================================
+# LOGIN PAGE FUNCTION
+# ============================================================
+# ================= KASIR LOGIN =================
+def _render_kasir_tab():
+    # form: password baru dikirim saat submit, bukan tiap ketikan
+    with st.form("kasir_form"):
+        kasir_pwd = labeled_input(
+            SPACER + HDR.format("🏪 Akses Outlet") + LBL.format("Password Outlet"),
+            "Password Outlet", type="password", key="kasir_pass"
+        )
+        login_kasir = st.form_submit_button("LOGIN KASIR", use_container_width=True)
 
-        /* Input Field: Biru Gelap Transparan (Bukan Putih) */
-        div[data-baseweb="input"], div[data-baseweb="base-input"] {
-            background-color: rgba(10, 25, 47, 0.6) !important; 
-            border: 1px solid rgba(136, 146, 176, 0.3) !important;
-            border-radius: 10px !important;
-            color: white !important;
-        }
+    if login_kasir:
+        cabang = KASIR_HASHES.get(hash_password(kasir_pwd))
+        if cabang:
+            st.session_state.update(kasir_logged_in=True, page="kasir", cabang=cabang)
 
-        /* Teks di dalam input: Putih Kebiruan (Jelas terbaca) */
-        input[type="text"], input[type="password"], input[type="number"] {
-            color: #000000 !important; 
-            -webkit-text-fill-color: #000000 !important;
-            caret-color: #000000 !important; 
-        }
+            # pesan sukses ditampilkan di halaman kasir setelah rerun
+            st.session_state["flash_toast"] = (f"ACCESS GRANTED: Cabang {cabang.upper()}", "✅")
+            st.rerun()
+        else:
+            st.error("❌ Access Denied: Password Salah")
+
+# ================= DAFTAR SELLER =================
+def _render_register_tab():
+    render_html(SPACER + HDR.format("✨ Join Mitra Baru"))
+    with st.form("form_daftar_seller"):
+        col_a, col_b = st.columns(2)
+        with col_a:
+            nama = labeled_input(
+                LBL.format("Nama Lengkap"),
+                "Nama Lengkap"
+            )
+        with col_b:
+            nohp = labeled_input(
+                LBL.format("No. Handphone"),
+                "No. Handphone"
+            )
+        id_seller = labeled_input(
+            LBL.format("Buat ID Unik (3 Digit - Contoh: A01)"),
+            "Buat ID Unik (3 Digit - Contoh: A01)", max_chars=3
+        )
 
-        /* ============================================================
-           DESAIN UTAMA (BACKGROUND & CONTAINER)
-           ============================================================ */
-
-        /* Background Biru Laut (Tetap) */
-        .stApp {
-            background-color: #0D5EA6;
-            background-image: 
-                radial-gradient(at 0% 0%, rgba(0, 242, 255, 0.15) 0px, transparent 50%),
-                radial-gradient(at 100% 100%, rgba(0, 100, 255, 0.15) 0px, transparent 50%);
-            background-attachment: fixed;
-        }
+        render_html(SPACER)
+        submit = st.form_submit_button("DAFTAR SEKARANG", use_container_width=True)
 
-        /* Hilangkan Header/Footer bawaan */
-        header, footer {visibility: hidden;}
-        
-        /* Container Tengah (Kaca Biru) */
-        div[data-testid="column"]:nth-of-type(2) {
-            background: rgba(10, 25, 47, 0.7);
-            border: 1px solid rgba(100, 255, 218, 0.1);
-            border-top: 1px solid rgba(100, 255, 218, 0.3);
-            border-radius: 20px;
-            padding: 40px;
-            backdrop-filter: blur(15px);
-            box-shadow: 0 0 40px rgba(0, 0, 0, 0.6);
-        }
+    if submit:
+        # normalisasi hanya saat submit
+        id_seller = id_seller.strip().upper()
 
-        /* ============================================================
-           JUDUL: PAWON SAPPITOE (UBAH JADI PUTIH SOLID)
-           ============================================================ */
-        .cyber-title {
-            font-size: 3rem;        /* Ukuran Tetap */
-            font-weight: 800;       /* Tebal Tetap */
-            text-align: center;
-            
-            /* GANTI DI SINI: Jadi Putih Solid */
-            color: #FFFFFF !important; 
-            
-            /* Hapus efek gradient text yg bikin masalah, sisakan glow saja */
-            text-shadow: 0 0 20px rgba(0, 242, 255, 0.5); /* Efek bersinar biru muda */
-            margin-bottom: 5px;
-        }
-        
-        .cyber-subtitle {
-            text-align: center;
-            color: #FFFFFF !important; /* Putih Solid */
-            font-size: 1rem;
-            letter-spacing: 1px;
-            margin-bottom: 30px;
-        }
+        # Validasi (ditolak di sini tanpa query ke DB)
+        if not SELLER_ID_RE.fullmatch(id_seller):
+            st.error("ID harus tepat 3 karakter (huruf/angka).")
+            return
+        if not nama or not nohp:
+            st.error("Data harus lengkap.")
+            return
 
-        /* ============================================================
-           ELEMENT LAIN (TABS, TOMBOL, ALERT) - TETAP SAMA
-           ============================================================ */
-
-        /* Tabs */
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 10px;
-            background-color: rgba(2, 12, 27, 0.5);
-            padding: 8px;
-            border-radius: 12px;
-            border: 1px solid rgba(255,255,255,0.05);
-        }
-        .stTabs [data-baseweb="tab"] {
-            height: 45px;
-            border-radius: 8px;
-            color: #8892b0;
-            font-weight: 600;
-            border: none;
-            background-color: transparent;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: rgba(0, 242, 255, 0.1) !important;
-            color: #00f2ff !important;
-            border: 1px solid rgba(0, 242, 255, 0.2) !important;
-            box-shadow: 0 0 15px rgba(0, 242, 255, 0.1);
-        }
+        try:
+            # tanpa index (ID ganda lama) pakai INSERT ... WHERE NOT EXISTS
+            ins_seller = INS_SELLER if ensure_seller_index() else INS_SELLER_NO_INDEX
 
-        /* Tombol Login */
-        .stButton > button {
-            background: linear-gradient(90deg, #0072ff 0%, #00c6ff 100%) !important;
-            color: white !important;
-            border: none !important;
-            border-radius: 6px !important;
-            font-weight: bold !important;
-            letter-spacing: 1px;
-            padding: 12px 0 !important;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(0, 114, 255, 0.3);
-        }
-        .stButton > button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 0 25px rgba(0, 198, 255, 0.6);
-        }
-        
-        /* Alert Box */
-        .stAlert {
-            background-color: rgba(0, 242, 255, 0.05);
-            border: 1px solid rgba(0, 242, 255, 0.2);
-            color: #e6f1ff;
-        }
+            # INSERT sekaligus menjawab "terpakai?" dalam satu statement
+            with get_engine().begin() as conn:
+                inserted = conn.execute(
+                    ins_seller,
+                    {
+                        "nama": nama.strip(),
+                        "no_hp": nohp.strip(),
+                        "status": "belum diterima",
+                        "id_seller": id_seller,
+                    }
+                ).fetchone()
 
-        /* Label Input (Password Outlet dll) */
-        label p {
-            color: #e6f1ff !important;
-        }
+            if inserted is None:
+                st.warning("⚠️ ID sudah terpakai. Gunakan ID lain.")
+            else:
+                st.success("✅ Registrasi Terkirim!")
+                st.info(f"ID Login Anda: **{id_seller}** (Simpan ID ini!)")
 
-    </style>
-    """, unsafe_allow_html=True)
+        except Exception as e:
+            st.error(f"System Error: {e}")
+
+# ================= SELLER LOGIN =================
+def _render_seller_tab():
+    with st.form("seller_login_form"):
+        seller_id = labeled_input(
+            SPACER + HDR.format("🚀 Login Mitra") + LBL.format("ID Seller (3 Digit)"),
+            "ID Seller (3 Digit)", key="seller_login_id"
+        )
+        login_seller = st.form_submit_button("LOGIN SELLER", use_container_width=True)
+
+    if login_seller:
+        seller_id = seller_id.strip().upper()
+        if not seller_id:
+            st.warning("Masukkan ID.")
+        else:
+            # format ID tidak dicek di sini: ID lama bisa di luar pola A01
+            try:
+                sess = get_session_factory()()
+                try:
+                    row = sess.execute(
+                        SEL_SELLER_LOGIN,
+                        {"id": seller_id}
+                    ).fetchone()
+                    sess.commit()
+                except Exception:
+                    sess.rollback()
+                    raise
+
+                if not row:
+                    st.error("❌ ID Tidak Ditemukan.")
+                else:
+                    seller_id, sname, sstatus = row
+                    if sstatus != "diterima":
+                        st.warning("⏳ Akun dalam peninjauan admin.")
+                    else:
+                        st.session_state.update(
+                            seller_logged_in=True, id_seller=seller_id, nama_seller=sname
+                        )
+                        remember_seller_cookie(seller_id, sname)
+                        st.success(f"Welcome back, {sname}!")
+                        st.rerun()
+            except Exception as e:
+                st.error(f"Connection Error: {e}")
+
+# ================= ADMIN LOGIN =================
+def _render_admin_tab():
+    with st.form("admin_login_form"):
+        admin_pwd = labeled_input(
+            SPACER + HDR.format("🛡️ Admin") + LBL.format("Password Admin"),
+            "Password Admin", type="password", key="admin_pass"
+        )
+        login_admin = st.form_submit_button("LOGIN", use_container_width=True)
+
+    if login_admin:
+        if ADMIN_HASH and hmac.compare_digest(hash_password(admin_pwd), ADMIN_HASH):
+            st.session_state.admin_logged_in = True
+            st.success("System Unlocked.")
+            st.rerun()
+        else:
+            st.error("⛔ Unauthorized Access.")
+
+# hanya section yang dipilih yang dipanggil (widget-nya dibangun)
+LOGIN_SECTIONS = {
+    "Kasir": _render_kasir_tab,
+    "Register": _render_register_tab,
+    "Seller": _render_seller_tab,
+    "Admin": _render_admin_tab,
+}
 
-# ============================================================
-# LOGIN PAGE FUNCTION
-# ============================================================
 def show_login_page():
     inject_blue_theme()
     
@@ -1168,139 +1743,84 @@ def show_login_page():
     
     with col2:
         # Header Visual
-        st.markdown('<div class="cyber-title">PAWON SAPPITOE</div>', unsafe_allow_html=True)
-        st.markdown('<div class="cyber-subtitle">WEB APP SISTEM KASIR DAN ADMIN</div>', unsafe_allow_html=True)
-
-        # Tab Navigation
-        tab_kasir, tab_daftar, tab_seller, tab_admin = st.tabs(
-            ["💳 Kasir", "📝 Register", "👤 Seller", "🔐 Admin"]
+        render_html(
+            '<div class="cyber-title">PAWON SAPPITOE</div>'
+            '<div class="cyber-subtitle">WEB APP SISTEM KASIR DAN ADMIN</div>'
         )
 
-        # ================= KASIR LOGIN =================
-        with tab_kasir:
-            st.write("")
-            st.markdown("<h5 style='color: #FFFFFF; margin-bottom: 10px;'>🏪 Akses Outlet</h5>", unsafe_allow_html=True)
-            st.markdown("<h5 style='color: #FFFFFF; margin-bottom: 0px;'>Password Outlet</h5>", unsafe_allow_html=True)
+        # Navigasi: hanya section yang dipilih yang dibangun widget-nya
+        # (st.tabs selalu membangun keempat tab di setiap rerun)
+        login_icons = {"Kasir": "💳", "Register": "📝", "Seller": "👤", "Admin": "🔐"}
+        choice = st.segmented_control(
+            "Mode",
+            list(login_icons),
+            default="Kasir",
+            format_func=lambda m: f"{login_icons[m]} {m}",
+            key="login_mode",
+            label_visibility="collapsed",
+        ) or "Kasir"
 
-            pwd = st.text_input("Password Outlet", type="password", key="kasir_pass", label_visibility="collapsed")
+        LOGIN_SECTIONS[choice]()
 
-            if st.button("LOGIN KASIR", use_container_width=True):
-                if pwd in KASIR_PASSWORDS:
-                    # Animasi Loading
-                    with st.spinner('Authenticating...'):
-                        time.sleep(0.8) 
-                    
-                    st.session_state.kasir_logged_in = True
-                    st.session_state.page = "kasir"
-                    st.session_state.cabang = KASIR_PASSWORDS[pwd]
-                    
-                    st.success(f"ACCESS GRANTED: Cabang {st.session_state.cabang.upper()}")
-                    st.balloons()
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    st.error("❌ Access Denied: Password Salah")
-
-        # ================= DAFTAR SELLER =================
-        with tab_daftar:
-            st.write("")
-            st.markdown("<h5 style='color: #FFFFFF; margin-bottom: 10px;'>✨ Join Mitra Baru</h5>", unsafe_allow_html=True)
-            with st.form("form_daftar_seller"):
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    st.markdown("<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>Nama Lengkap</h5>", unsafe_allow_html=True)
-                    nama = st.text_input("Nama Lengkap", label_visibility="collapsed")
-                with col_b:
-                    st.markdown("<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>No. Handphone</h5>", unsafe_allow_html=True)
-                    nohp = st.text_input("No. Handphone", label_visibility="collapsed")
-                st.markdown("<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>Buat ID Unik (3 Digit - Contoh: A01)</h5>", unsafe_allow_html=True)
-                id_seller = st.text_input("Buat ID Unik (3 Digit - Contoh: A01)", max_chars=3, label_visibility="collapsed").upper().strip()
-                
-                st.write("")
-                submit = st.form_submit_button("DAFTAR SEKARANG", use_container_width=True)
-            
-            if submit:
-                # Validasi
-                if not id_seller or len(id_seller) != 3:
-                    st.error("ID harus tepat 3 karakter.")
-                    st.stop()
-                if not nama or not nohp:
-                    st.error("Data harus lengkap.")
-                    st.stop()
+# ============================================================
+# COOKIE LOGIN SELLER
+# ============================================================
+SELLER_COOKIE = "seller_session"
+SELLER_COOKIE_TTL = 12 * 60 * 60  # detik
 
-                try:
-                    with engine.connect() as conn:
-                        exists = conn.execute(
-                            text("SELECT 1 FROM seller WHERE id_seller = :id"),
-                            {"id": id_seller}
-                        ).fetchone()
-                    
-                    if exists:
-                        st.warning("⚠️ ID sudah terpakai. Gunakan ID lain.")
-                    else:
-                        with engine.begin() as conn:
-                            conn.execute(
-                                text("INSERT INTO seller (nama_seller, no_hp, status, id_seller) VALUES (:nama, :no_hp, :status, :id_seller)"),
-                                {
-                                    "nama": nama.strip(),
-                                    "no_hp": nohp.strip(),
-                                    "status": "belum diterima",
-                                    "id_seller": id_seller,
-                                }
-                            )
-                        st.success("✅ Registrasi Terkirim!")
-                        st.info(f"ID Login Anda: **{id_seller}** (Simpan ID ini!)")
-                        
-                except Exception as e:
-                    st.error(f"System Error: {e}")
+def _sign_cookie(payload: str) -> str:
+    return hmac.new(COOKIE_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+def make_seller_token(id_seller, nama_seller):
+    data = {"role": "seller", "id": id_seller, "nama": nama_seller,
+            "exp": int(time.time()) + SELLER_COOKIE_TTL}
+    payload = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+    return f"{payload}.{_sign_cookie(payload)}"
+
+def read_seller_token(token):
+    """Kembalikan (id_seller, nama_seller) jika token valid, selain itu None."""
+    if not token or "." not in token:
+        return None
+    payload, sig = token.rsplit(".", 1)
+    # bandingkan bytes: str non-ASCII (cookie diutak-atik) bikin TypeError
+    if not hmac.compare_digest(sig.encode(), _sign_cookie(payload).encode()):
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(payload))
+    except ValueError:
+        return None
+    if data.get("role") != "seller" or data.get("exp", 0) < time.time():
+        return None
+    return data.get("id"), data.get("nama")
+
+def remember_seller_cookie(id_seller, nama_seller):
+    if cookies is not None:
+        cookies[SELLER_COOKIE] = make_seller_token(id_seller, nama_seller)
+        cookies.save()
+
+def forget_seller_cookie():
+    if cookies is not None and SELLER_COOKIE in cookies:
+        del cookies[SELLER_COOKIE]
+        cookies.save()
+
+# dibuat per session (bukan cache_resource): isinya cookie milik browser user ini
+cookies = None
+if COOKIE_SECRET:
+    cookies = CookieManager(prefix="pawon/")
+    if not cookies.ready():
+        st.stop()
+
+    # refresh / buka tab baru: login seller dipulihkan dari cookie, asal
+    # seller masih berstatus diterima (ditolak/dihapus admin -> cookie dibuang)
+    if not st.session_state.seller_logged_in:
+        restored = read_seller_token(cookies.get(SELLER_COOKIE))
+        if restored:
+            sid, sname = restored
+            if _seller_status(sid) == "diterima":
+                st.session_state.update(seller_logged_in=True, id_seller=sid, nama_seller=sname)
+            else:
+                forget_seller_cookie()
 
-        # ================= SELLER LOGIN =================
-        with tab_seller:
-            st.write("")
-            st.markdown("<h5 style='color: #FFFFFF; margin-bottom: 10px;'>🚀 Login Mitra</h5>", unsafe_allow_html=True)
-            st.markdown("<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>ID Seller (3 Digit)</h5>", unsafe_allow_html=True)
-            seller_id = st.text_input("ID Seller (3 Digit)",  label_visibility="collapsed", key="seller_login_id")
-            
-            if st.button("LOGIN SELLER", use_container_width=True):
-                if not seller_id.strip():
-                    st.warning("Masukkan ID.")
-                else:
-                    try:
-                        with engine.connect() as conn:
-                            row = conn.execute(
-                                text("SELECT id_seller, nama_seller, status FROM seller WHERE id_seller = :id"),
-                                {"id": seller_id.upper()}
-                            ).fetchone()
-
-                        if not row:
-                            st.error("❌ ID Tidak Ditemukan.")
-                        else:
-                            sid, sname, sstatus = row
-                            if sstatus != "diterima":
-                                st.warning("⏳ Akun dalam peninjauan admin.")
-                            else:
-                                st.session_state.seller_logged_in = True
-                                st.session_state.id_seller = sid
-                                st.session_state.nama_seller = sname
-                                st.success(f"Welcome back, {sname}!")
-                                st.rerun()
-                    except Exception as e:
-                        st.error(f"Connection Error: {e}")
-
-        # ================= ADMIN LOGIN =================
-        with tab_admin:
-            st.write("")
-            st.markdown("<h5 style='color: #FFFFFF; margin-bottom: 10px;'>🛡️ Admin</h5>", unsafe_allow_html=True)
-            st.markdown("<h5 style='color: #FFFFFF; font-size: 15px; margin-bottom: 0px;'>Password Admin</h5>", unsafe_allow_html=True)
-            pwd = st.text_input("Password Admin", label_visibility="collapsed", type="password", key="admin_pass")
-            
-            if st.button("LOGIN", use_container_width=True):
-                if pwd == ADMIN_PASSWORD:
-                    st.session_state.admin_logged_in = True
-                    st.success("System Unlocked.")
-                    st.rerun()
-                else:
-                    st.error("⛔ Unauthorized Access.")
 # ============================================================
 # ROUTING — WAJIB LOGIN
 # ============================================================
@@ -1344,6 +1864,11 @@ def lock_draft_to_final(draft_id, locked_by="admin"):
             SET is_locked=true, locked_at=NOW(), locked_by=:by, updated_at=NOW()
             WHERE id=:id
         """), {"id": int(draft_id), "by": locked_by})
+    clear_voucher_cache()
+
+# item transaksi "Nama x2" (histori: qty bulat) / "Nama x0.5" (edit draft)
+_MENU_RE = re.compile(r"^(?P<Menu>.+?)\s*[xX]\s*(?P<Jumlah>\d+)")
+_ITEM_QTY_RE = re.compile(r"(.+?)\s*[xX]\s*([0-9]*\.?[0-9]+)")
 
 def parse_items_str(items_str: str) -> pd.DataFrame:
 
@@ -1353,7 +1878,7 @@ def parse_items_str(items_str: str) -> pd.DataFrame:
 
     for part in str(items_str).split(","):
         part = part.strip()
-        m = re.match(r"(.+?)\s*[xX]\s*([0-9]*\.?[0-9]+)", part)
+        m = _ITEM_QTY_RE.match(part)
         if m:
             rows.append({"menu": m.group(1).strip(), "qty": float(m.group(2))})
         else:
@@ -1440,16 +1965,15 @@ def get_voucher_balance(engine, code):
         return None, None
     return int(r[0] or 0), str(r[1] or "")
 
-def page_admin():
-    st.header("Halaman Admin")
-    show_back_to_login_button("admin")
-    tab_edit, tab_edit_seller, tab_laporan, tab_histori, tab_menu, tab_kupon, tab_lock = st.tabs([
-    "Informasi Kupon", "Edit Seller", "Laporan warung", "Histori", "Kelola Menu", "Kelola Kupon", "🔒 Lock Transaksi"])
-
-    with tab_edit:
-        st.subheader("Informasi Kupon")
+# ============================================================
+# HALAMAN ADMIN
+# ============================================================
+def _render_admin_kupon():
+    st.subheader("Informasi Kupon")
 
-        # Search & Filter Inputs
+    # Search & Filter Inputs: dalam form supaya query baru jalan saat
+    # tombol Cari ditekan, bukan tiap ketikan / ganti pilihan
+    with st.form("voucher_filters"):
         col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
         with col1:
             kode_cari = st.text_input(
@@ -1475,745 +1999,665 @@ def page_admin():
                 ["semua", "50000", "100000", "200000"],
                 index=0
             )
-        
-        # Query builder
-        try:
-            query = "SELECT * FROM vouchers"
-            where_conditions = []
-            params = {}
-        
-            # Filter status
-            if filter_status != "semua":
-                where_conditions.append("status = :status")
-                params["status"] = filter_status
-        
-            # Filter kode
-            if kode_cari:
-                if cari_berdasarkan == "Kode":
-                    where_conditions.append("UPPER(code) LIKE :val")
-                elif cari_berdasarkan == "Nama Seller":
-                    where_conditions.append("UPPER(seller) LIKE :val")
-                elif cari_berdasarkan == "Nama Pembeli":
-                    where_conditions.append("UPPER(nama) LIKE :val")
-            
-                params["val"] = f"%{kode_cari.upper()}%"
-                    
-            # Filter nominal
-            if filter_nominal != "semua":
-                where_conditions.append("initial_value = :nominal")
-                params["nominal"] = int(filter_nominal)
-        
-            # Gabungkan SQL final
-            if where_conditions:
-                query += " WHERE " + " AND ".join(where_conditions)
-        
-            query += """
-             ORDER BY 
-                 CASE 
-                    WHEN seller IS NOT NULL AND seller <> '' THEN 1
-                    ELSE 2
-                END,
-                CASE 
-                    WHEN status = 'active' THEN 1
-                    WHEN status = 'habis' THEN 2
-                    WHEN status = 'proses' THEN 3
-                    WHEN status = 'inactive' THEN 4
-                    ELSE 5
-                END,
-                CASE
-                    WHEN initial_value = 50000 THEN 1
-                    WHEN initial_value = 100000 THEN 2
-                    WHEN initial_value = 200000 THEN 3
-                    ELSE 4
-                END,
-                code ASC
-            """
-        
-            with engine.connect() as conn:
-                df_voucher = pd.read_sql(text(query), conn, params=params)
-        
-            if df_voucher.empty:
-                st.info("Tidak ada voucher ditemukan.")
-            else:
-        
-                # Format nominal
-                format_nominal = lambda x: "-" if pd.isna(x) else f"Rp {int(x):,}"
-                for col in ["initial_value", "balance", "tunai"]:
-                    if col in df_voucher:
-                        df_voucher[col] = df_voucher[col].apply(format_nominal)
-        
-                # Status + badge warna 🎨
-                def status_badge(x):
-                    if x == "active" or x == "Active":
-                        return "🟢 active"
-                    elif x == "habis" or x == "sold out":
-                        return "🔴 habis" 
-                    elif x == "proses":
-                        return "🟡 proses"
-                    return "⚪ inactive"
-        
-                df_voucher["status"] = df_voucher["status"].apply(status_badge)
-        
-                # Display tabel dengan badge
-                st.dataframe(
-                    df_voucher[
-                        ["code", "nama", "no_hp", "status", "tanggal_aktivasi",
-                         "initial_value", "balance", "tunai", "seller", "tanggal_penjualan"]
-                    ],
-                    use_container_width=True,
-                )
-        
-                # Jika search cocok dengan 1 voucher → tampilkan form edit
-                if kode_cari:
-                    match_col = {
-                        "Kode": "code",
-                        "Nama Seller": "seller",
-                        "Nama Pembeli": "nama"
-                    }.get(cari_berdasarkan, "code")
-                
-                    matched = df_voucher[
-                        df_voucher[match_col].astype(str).str.upper() == kode_cari.upper()
-                    ]
-                    if matched.empty:
-                        st.warning("Tidak ditemukan voucher yang cocok dengan pencarian.")
-                    else:
-                        v = matched.iloc[0]
-                        st.markdown("---")
-                        st.subheader(f"✏️ Edit Kupon: {v['code']}")
-        
-                        with st.form(key=f"edit_form_{v['code']}"):
-                            nama_in = st.text_input("Nama Pembeli", v["nama"] or "")
-                            nohp_in = st.text_input("No HP Pembeli", v["no_hp"] or "")
-                            status_in = st.selectbox(
-                                "Status",
-                                ["inactive", "active", "habis"],
-                                index=["inactive", "active", "habis"].index(
-                                    v["status"] if v["status"] in ["inactive", "active", "habis"] else "active"
-                                )
-                            )
-                            nama_sell = st.text_input("Nama Seller", v["seller"] or "")
-                            tgl_jual_in = st.date_input(
-                                "Tanggal Penjualan",
-                                value=v["tanggal_penjualan"] if isinstance(v["tanggal_penjualan"], (date, datetime)) else date.today()
-                            )
-                            tgl_aktif_in = st.date_input(
-                                "Tanggal Aktivasi",
-                                value=v["tanggal_aktivasi"] if isinstance(v["tanggal_aktivasi"], (date, datetime)) else date.today()
-                            )
-        
-                            submit = st.form_submit_button("💾 Simpan Perubahan")
-                            if submit:
-                                if not nama_in:
-                                    st.error("Nama Pembeli tidak boleh kosong.")
-                                    st.stop()
-
-                                if not nohp_in:
-                                    st.error("Nomor HP Pembeli tidak boleh kosong.")
-                                    st.stop()
-
-                                if not nama_sell:
-                                    st.error("Nama Seller tidak boleh kosong.")
-                                    st.stop()
-                                    
-                                with engine.begin() as conn2:
-                                    conn2.execute(text("""
-                                        UPDATE public.vouchers
-                                        SET nama = :nama,
-                                            no_hp = :no_hp,
-                                            status = :status,
-                                            seller = :seller,
-                                            tanggal_penjualan = :tgl_jual,
-                                            tanggal_aktivasi = :tgl_aktif
-                                        WHERE code = :code
-                                    """), {
-                                        "nama": nama_in.strip(),
-                                        "no_hp": nohp_in.strip(),
-                                        "status": status_in,
-                                        "seller": nama_sell.strip(),
-                                        "tgl_jual": tgl_jual_in.strftime("%Y-%m-%d"),
-                                        "tgl_aktif": tgl_aktif_in.strftime("%Y-%m-%d"),
-                                        "code": v["code"]
-                                    })
-        
-                                st.success(f"Voucher {v['code']} berhasil diupdate.")
-                                st.rerun()
-        
-        except Exception as e:
-            st.error("❌ Terjadi error saat memuat data kupon.")
-            st.code(str(e))
 
-    with tab_edit_seller:
-        st.subheader("Kelola Seller")
-        tab_kepemilikan, tab_acc, tab_aktivasi = st.tabs(["Kepemilikan Kupon", "Penerimaan Seller", "Aktivasi Kupon"])
-    
-        with tab_kepemilikan:
-            st.subheader("🎯 Serahkan Kupon ke Seller")
-    
-            try:
-                with engine.connect() as conn:
-                    df_seller = pd.read_sql("""
-                        SELECT * FROM public.seller
-                        WHERE status = 'diterima'
-                        ORDER BY nama_seller ASC
-                    """, conn)
-    
-                if df_seller.empty:
-                    st.info("Belum ada seller yang berstatus 'diterima'.")
-                else:
-                    selected_seller = st.selectbox(
-                        "Pilih Seller untuk diberikan kupon",
-                        df_seller["nama_seller"].tolist()
+        st.form_submit_button("🔍 Cari")
+
+    # Query builder
+    try:
+        df_voucher = _load_vouchers(filter_status, filter_nominal, cari_berdasarkan, kode_cari)
+
+        if df_voucher.empty:
+            st.info("Tidak ada voucher ditemukan.")
+        else:
+
+            # Format nominal ("-" untuk kosong)
+            for col in ["initial_value", "balance", "tunai"]:
+                if col in df_voucher:
+                    s = df_voucher[col]
+                    df_voucher[col] = (
+                        s.dropna().astype("int64").map("Rp {:,}".format)
+                        .reindex(s.index, fill_value="-")
                     )
-    
-                    selected_row = df_seller[df_seller["nama_seller"] == selected_seller].iloc[0]
-                    seller_hp = selected_row["no_hp"]
-                    id_unik = selected_row["id_seller"]
-    
-                    # Ambil voucher yang dimiliki seller
-                    with engine.connect() as conn:
-                        df_current_voucher = pd.read_sql(
-                            text("""
-                                SELECT code, initial_value, balance, status, tanggal_penjualan
-                                FROM vouchers
-                                WHERE seller = :seller
-                                ORDER BY tanggal_penjualan DESC NULLS LAST
-                            """),
-                            conn,
-                            params={"seller": selected_seller}
-                        )
-    
+
+            # Status + badge warna 🎨
+            df_voucher["status"] = df_voucher["status"].map(STATUS_BADGE).fillna("⚪ inactive")
+
+            # Display tabel dengan badge
+            st.dataframe(
+                df_voucher[
+                    ["code", "nama", "no_hp", "status", "tanggal_aktivasi",
+                     "initial_value", "balance", "tunai", "seller", "tanggal_penjualan"]
+                ],
+                use_container_width=True,
+            )
+
+            # Jika search cocok dengan 1 voucher → tampilkan form edit
+            if kode_cari:
+                matched = df_voucher[df_voucher["match_u"] == kode_cari]
+                if matched.empty:
+                    st.warning("Tidak ditemukan voucher yang cocok dengan pencarian.")
+                else:
+                    v = matched.iloc[0]
                     st.markdown("---")
-                    st.subheader("📋 Informasi Seller")
-                    st.write(f"**Nama:** {selected_seller}")
-                    st.write(f"**No HP:** {seller_hp}")
-                    st.write(f"**ID Seller:** {id_unik}")
-                    st.write(f"**Jumlah kupon yang dimiliki:** {len(df_current_voucher)}")
-    
-                    if not df_current_voucher.empty:
-                        st.markdown("**Kupon yang saat ini dimiliki:**")
-                        df_sorted = df_current_voucher.sort_values(
-                            by=["status", "tanggal_penjualan"],
-                            ascending=[True, False]
+                    st.subheader(f"✏️ Edit Kupon: {v['code']}")
+
+                    with st.form(key=f"edit_form_{v['code']}"):
+                        nama_in = st.text_input("Nama Pembeli", v["nama"] or "")
+                        nohp_in = st.text_input("No HP Pembeli", v["no_hp"] or "")
+                        status_in = st.selectbox(
+                            "Status",
+                            ["inactive", "active", "habis"],
+                            index=["inactive", "active", "habis"].index(
+                                v["status"] if v["status"] in ["inactive", "active", "habis"] else "active"
+                            )
                         )
-                    
-                        st.dataframe(
-                            df_sorted[["code", "tanggal_penjualan", "status"]],
-                            use_container_width=True
+                        nama_sell = st.text_input("Nama Seller", v["seller"] or "")
+                        tgl_jual_in = st.date_input(
+                            "Tanggal Penjualan",
+                            value=v["tanggal_penjualan"] if isinstance(v["tanggal_penjualan"], (date, datetime)) else date.today()
                         )
-                    else:
-                        st.info("Seller ini belum memiliki voucher apa pun.")
-    
-                    # Ambil voucher yang belum diassign
-                    with engine.connect() as conn:
-                        df_voucher = pd.read_sql("""
-                            SELECT code, initial_value, balance, status
-                            FROM public.vouchers
-                            WHERE seller IS NULL OR TRIM(seller) = ''
-                        """, conn)
-    
-                    st.markdown("---")
-                    st.subheader(f"🧾 Pilih Kupon Baru untuk {selected_seller}")
-    
-                    if df_voucher.empty:
-                        st.info("Semua kupon sudah diassign ke seller.")
-                    else:
-                        selected_vouchers = st.multiselect(
-                            "Pilih kode kupon yang akan diberikan",
-                            df_voucher["code"].tolist()
+                        tgl_aktif_in = st.date_input(
+                            "Tanggal Aktivasi",
+                            value=v["tanggal_aktivasi"] if isinstance(v["tanggal_aktivasi"], (date, datetime)) else date.today()
                         )
-    
-                        if st.button("💾 Simpan Penyerahan Kupon") and selected_vouchers:
-                            try:
-                                today = date.today()
-    
-                                with engine.begin() as conn2:
-                                    for code in selected_vouchers:
-                                        conn2.execute(
-                                            text("""
-                                                UPDATE vouchers
-                                                SET seller = :seller,
-                                                    tanggal_penjualan = :tgl
-                                                WHERE code = :code
-                                            """),
-                                            {
-                                                "seller": selected_seller,
-                                                "tgl": today,
-                                                "code": code
-                                            }
-                                        )
-    
-                                with engine.connect() as conn3:
-                                    df_changed = pd.read_sql(
-                                        text("""
-                                            SELECT code, seller, tanggal_penjualan
-                                            FROM public.vouchers
-                                            WHERE code IN :codes
-                                        """),
-                                        conn3,
-                                        params={"codes": tuple(selected_vouchers)}
-                                    )
-    
-                                st.success(f"✅ {len(selected_vouchers)} kupon berhasil diassign ke seller {selected_seller}.")
-                                st.markdown("### 🔍 Kupon yang baru saja diubah:")
-                                st.dataframe(df_changed, use_container_width=True)
-    
-                            except Exception as e:
-                                st.error("❌ Gagal menyimpan assign kupon ke database.")
-                                st.code(str(e))
-    
-            except Exception as e:
-                st.error("❌ Gagal memuat data seller atau kupon.")
-                st.code(str(e))
-    
-        with tab_acc:
-            st.subheader("🧾 Daftar Calon Seller")
-            st.write("Berikut adalah daftar seller yang mendaftar. Klik 'Accept' untuk menyetujui pendaftaran.")
-    
-            try:
+
+                        submit = st.form_submit_button("💾 Simpan Perubahan")
+                        if submit:
+                            if not nama_in:
+                                st.error("Nama Pembeli tidak boleh kosong.")
+                                st.stop()
+
+                            if not nohp_in:
+                                st.error("Nomor HP Pembeli tidak boleh kosong.")
+                                st.stop()
+
+                            if not nama_sell:
+                                st.error("Nama Seller tidak boleh kosong.")
+                                st.stop()
+
+                            with engine.begin() as conn2:
+                                conn2.execute(text("""
+                                    UPDATE public.vouchers
+                                    SET nama = :nama,
+                                        no_hp = :no_hp,
+                                        status = :status,
+                                        seller = :seller,
+                                        tanggal_penjualan = :tgl_jual,
+                                        tanggal_aktivasi = :tgl_aktif
+                                    WHERE code = :code
+                                """), {
+                                    "nama": nama_in.strip(),
+                                    "no_hp": nohp_in.strip(),
+                                    "status": status_in,
+                                    "seller": nama_sell.strip(),
+                                    "tgl_jual": tgl_jual_in.strftime("%Y-%m-%d"),
+                                    "tgl_aktif": tgl_aktif_in.strftime("%Y-%m-%d"),
+                                    "code": v["code"]
+                                })
+                            clear_voucher_cache()
+
+                            st.success(f"Voucher {v['code']} berhasil diupdate.")
+                            st.rerun()
+
+    except Exception as e:
+        st.error("❌ Terjadi error saat memuat data kupon.")
+        st.code(str(e))
+
+def _render_admin_seller():
+    st.subheader("Kelola Seller")
+    tab_kepemilikan, tab_acc, tab_aktivasi = st.tabs(["Kepemilikan Kupon", "Penerimaan Seller", "Aktivasi Kupon"])
+
+    with tab_kepemilikan:
+        st.subheader("🎯 Serahkan Kupon ke Seller")
+
+        try:
+            with engine.connect() as conn:
+                df_seller = pd.read_sql("""
+                    SELECT nama_seller, no_hp, id_seller FROM public.seller
+                    WHERE status = 'diterima'
+                    ORDER BY nama_seller ASC
+                """, conn)
+
+            if df_seller.empty:
+                st.info("Belum ada seller yang berstatus 'diterima'.")
+            else:
+                selected_seller = st.selectbox(
+                    "Pilih Seller untuk diberikan kupon",
+                    df_seller["nama_seller"].tolist()
+                )
+
+                selected_row = df_seller[df_seller["nama_seller"] == selected_seller].iloc[0]
+                seller_hp = selected_row["no_hp"]
+                id_unik = selected_row["id_seller"]
+
+                # Ambil voucher yang dimiliki seller
                 with engine.connect() as conn:
-                    df_seller_pending = pd.read_sql("""
-                        SELECT * FROM seller
-                        WHERE status = 'belum diterima'
-                        ORDER BY nama_seller ASC
-                    """, conn)
-        
-                if df_seller_pending.empty:
-                    st.info("Belum ada data seller yang mendaftar.")
+                    df_current_voucher = pd.read_sql(
+                        text("""
+                            SELECT code, initial_value, balance, status, tanggal_penjualan
+                            FROM vouchers
+                            WHERE seller = :seller
+                            ORDER BY tanggal_penjualan DESC NULLS LAST
+                        """),
+                        conn,
+                        params={"seller": selected_seller}
+                    )
+
+                st.markdown("---")
+                st.subheader("📋 Informasi Seller")
+                st.write(f"**Nama:** {selected_seller}")
+                st.write(f"**No HP:** {seller_hp}")
+                st.write(f"**ID Seller:** {id_unik}")
+                st.write(f"**Jumlah kupon yang dimiliki:** {len(df_current_voucher)}")
+
+                if not df_current_voucher.empty:
+                    st.markdown("**Kupon yang saat ini dimiliki:**")
+                    df_sorted = df_current_voucher.sort_values(
+                        by=["status", "tanggal_penjualan"],
+                        ascending=[True, False]
+                    )
+
+                    st.dataframe(
+                        df_sorted[["code", "tanggal_penjualan", "status"]],
+                        use_container_width=True
+                    )
                 else:
-                    for idx, row in df_seller_pending.iterrows():
-                        col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
-                        with col1:
-                            st.write(f"**Nama:** {row['nama_seller']}")
-                            st.write(f"No HP: {row['no_hp']}")
-                        with col2:
-                            st.write(f"Status: {row['status'] or '-'}")
-                            st.write(f"ID Seller: {row['id_seller']}")
-                        with col3:
-                            if st.button("✅ Accept", key=f"accept_{row['nama_seller']}_{idx}"):
-                                try:
-                                    with engine.begin() as conn2:
-                                        conn2.execute(
-                                            text("""
-                                                UPDATE seller
-                                                SET status = 'diterima'
-                                                WHERE nama_seller = :nama_seller
-                                                  AND no_hp = :no_hp
-                                            """),
-                                            {"nama_seller": row["nama_seller"], "no_hp": row["no_hp"]}
-                                        )
-                                    st.success(f"Seller {row['nama_seller']} diterima ✅")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Gagal update status seller: {e}")
-        
-                        with col4:
-                            if st.button("🗑️ Hapus", key=f"hapus_{row['nama_seller']}_{idx}"):
-                                try:
-                                    with engine.begin() as conn3:
-                                        conn3.execute(
-                                            text("""
-                                                DELETE FROM seller
-                                                WHERE nama_seller = :nama_seller
-                                                  AND no_hp = :no_hp
-                                            """),
-                                            {"nama_seller": row["nama_seller"], "no_hp": row["no_hp"]}
-                                        )
-                                    st.warning(f"Data seller {row['nama_seller']} telah dihapus ❌")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Gagal menghapus data seller: {e}")
-        
-            except Exception as e:
-                st.error("❌ Gagal mengambil data seller dari database.")
-                st.code(str(e))
-                
-        with tab_aktivasi:
-            st.subheader("🎟️ Daftar Kupon Berstatus 'Proses'")
-            st.write("Berikut adalah daftar kupon yang masih dalam proses validasi.")
-        
-            try:
-                # Ambil data kupon yang masih proses
+                    st.info("Seller ini belum memiliki voucher apa pun.")
+
+                # Ambil voucher yang belum diassign
                 with engine.connect() as conn:
-                    df_voucher_pending = pd.read_sql("""
-                        SELECT 
-                            code,
-                            initial_value,
-                            status,
-                            seller,
-                            nama
+                    df_voucher = pd.read_sql("""
+                        SELECT code, initial_value, balance, status
                         FROM public.vouchers
-                        WHERE status = 'proses'
-                        ORDER BY code ASC
+                        WHERE seller IS NULL OR TRIM(seller) = ''
                     """, conn)
-        
-                if df_voucher_pending.empty:
-                    st.info("Belum ada kupon yang ingin diaktivasi.")
+
+                st.markdown("---")
+                st.subheader(f"🧾 Pilih Kupon Baru untuk {selected_seller}")
+
+                if df_voucher.empty:
+                    st.info("Semua kupon sudah diassign ke seller.")
                 else:
-                    for idx, row in df_voucher_pending.iterrows():
-                        col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
-        
-                        # Kolom informasi
-                        with col1:
-                            st.write(f"**Seller:** {row['seller'] or '-'}")
-                            st.write(f"**Pembeli:** {row['nama'] or '-'}")
-        
-                        with col2:
-                            st.write(f"Kode Kupon: **{row['code']}**")
-                            st.write(f"Initial Value: Rp {int(row['initial_value']):,}")
-        
-                        # Tombol Accept
-                        with col3:
-                            if st.button("✅ Aktivasi", key=f"accept_{row['code']}_{idx}"):
-                                try:
-                                    today = date.today()
-                                    with engine.begin() as conn2:
-                                        conn2.execute(
-                                            text("""
-                                                UPDATE vouchers
-                                                SET status = 'active', tanggal_aktivasi = :tanggal_aktivasi
-                                                WHERE code = :code
-                                            """),
-                                            {"code": row["code"], "tanggal_aktivasi": today}
-                                        )
-                                    st.success(f"Kupon {row['code']} telah diaktivasi ✅")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Gagal mengubah status kupon: {e}")
-        
-                        # Tombol Hapus
-                        with col4:
-                            if st.button("🗑️ Tolak", key=f"hapus_{row['code']}_{idx}"):
-                                try:
-                                    with engine.begin() as conn3:
-                                        conn3.execute(
-                                            text("""
-                                                UPDATE vouchers
-                                                SET status = 'inactive', nama = NULL, no_hp = NULL, tanggal_aktivasi = NULL
-                                                WHERE code = :code
-                                            """),
-                                            {"code": row["code"]}
-                                        )
-                                    st.warning(f"Data kupon {row['code']} telah dihapus ❌")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Gagal menghapus data kupon: {e}")
-        
-            except Exception as e:
-                st.error("❌ Gagal mengambil data kupon dari database.")
-                st.code(str(e))
+                    selected_vouchers = st.multiselect(
+                        "Pilih kode kupon yang akan diberikan",
+                        df_voucher["code"].tolist()
+                    )
 
-    with tab_laporan:
-        st.subheader("Laporan Warung")
-    
-        # Tabs untuk membagi laporan
-        tab_voucher, tab_transaksi, tab_seller = st.tabs(["Kupon", "Transaksi", "Seller"])
-    
-        df_vouchers = list_vouchers(limit=5000)
-        df_tx = list_transactions(limit=100000)
-    
-        if "tanggal_transaksi" in df_tx.columns:
-            df_tx["tanggal_transaksi"] = pd.to_datetime(df_tx["tanggal_transaksi"])
-    
-        # # ===== TAB Voucher =====
-        with tab_voucher:
-            st.subheader("📊 Laporan Kupon")
-        
-            # ============================
-            # 🔍 FILTER
-            # ============================
-            with st.expander("🔎 Filter Laporan"):
-                colf1, colf2 = st.columns(2)
-        
-                # Filter cabang
-                branch_filter = colf1.selectbox(
-                    "Pilih Cabang",
-                    ["Semua", "Sedati", "Tawangsari", "Kesambi", "Seller"]
+                    if st.button("💾 Simpan Penyerahan Kupon") and selected_vouchers:
+                        try:
+                            today = date.today()
+
+                            # satu statement untuk semua kode terpilih
+                            with engine.begin() as conn2:
+                                conn2.execute(
+                                    text("""
+                                        UPDATE vouchers
+                                        SET seller = :seller,
+                                            tanggal_penjualan = :tgl
+                                        WHERE code = ANY(:codes)
+                                    """),
+                                    {
+                                        "seller": selected_seller,
+                                        "tgl": today,
+                                        "codes": list(selected_vouchers)
+                                    }
+                                )
+                            clear_voucher_cache()
+
+                            with engine.connect() as conn3:
+                                df_changed = pd.read_sql(
+                                    text("""
+                                        SELECT code, seller, tanggal_penjualan
+                                        FROM public.vouchers
+                                        WHERE code = ANY(:codes)
+                                    """),
+                                    conn3,
+                                    params={"codes": list(selected_vouchers)}
+                                )
+
+                            st.success(f"✅ {len(selected_vouchers)} kupon berhasil diassign ke seller {selected_seller}.")
+                            st.markdown("### 🔍 Kupon yang baru saja diubah:")
+                            st.dataframe(df_changed, use_container_width=True)
+
+                        except Exception as e:
+                            st.error("❌ Gagal menyimpan assign kupon ke database.")
+                            st.code(str(e))
+
+        except Exception as e:
+            st.error("❌ Gagal memuat data seller atau kupon.")
+            st.code(str(e))
+
+    with tab_acc:
+        st.subheader("🧾 Daftar Calon Seller")
+        st.write("Berikut adalah daftar seller yang mendaftar. Centang 'Accept' / 'Hapus' lalu klik 'Proses Seller Terpilih'.")
+
+        try:
+            with engine.connect() as conn:
+                df_seller_pending = pd.read_sql("""
+                    SELECT nama_seller, no_hp, id_seller, status FROM seller
+                    WHERE status = 'belum diterima'
+                    ORDER BY nama_seller ASC
+                """, conn)
+
+            if df_seller_pending.empty:
+                st.info("Belum ada data seller yang mendaftar.")
+            else:
+                # satu tabel + satu tombol, bukan tombol per baris
+                df_seller_pending.insert(0, "accept", False)
+                df_seller_pending.insert(1, "hapus", False)
+                edited_seller = st.data_editor(
+                    df_seller_pending,
+                    use_container_width=True,
+                    hide_index=True,
+                    disabled=["nama_seller", "no_hp", "id_seller", "status"],
+                    column_config={
+                        "accept": st.column_config.CheckboxColumn("✅ Accept"),
+                        "hapus": st.column_config.CheckboxColumn("🗑️ Hapus"),
+                        "nama_seller": "Nama",
+                        "no_hp": "No HP",
+                        "id_seller": "ID Seller",
+                        "status": "Status",
+                    },
+                    key="editor_seller_pending",
                 )
-        
-                # Filter tanggal
-                tanggal_awal = colf1.date_input("Tanggal Awal", value=date.today().replace(day=1))
-                tanggal_akhir = colf2.date_input("Tanggal Akhir", value=date.today(), key="tanggal_akhir_laporan")
-        
-            vouchers = pd.read_sql("SELECT * FROM public.vouchers", engine)
-            transactions = pd.read_sql("SELECT * FROM public.transactions", engine)
-        
-            vouchers["initial_value"] = vouchers["initial_value"].fillna(0).astype(float)
-            vouchers["balance"] = vouchers["balance"].fillna(0).astype(float)
-            vouchers["tanggal_penjualan"] = pd.to_datetime(vouchers["tanggal_penjualan"], errors="coerce")
-            transactions["tanggal_transaksi"] = pd.to_datetime(transactions.get("tanggal_transaksi"), errors="coerce")
-        
-            if branch_filter != "Semua":
-                transactions = transactions[transactions["branch"] == branch_filter]
-        
-            transactions = transactions[
-                (transactions["tanggal_transaksi"].dt.date >= tanggal_awal) &
-                (transactions["tanggal_transaksi"].dt.date <= tanggal_akhir)
-            ]
-        
-            vouchers["used_value"] = vouchers["initial_value"] - vouchers["balance"]
-        
-            summary = {
-                "total_voucher_dijual": len(vouchers),
-                "total_voucher_aktif": len(vouchers[vouchers["status"] == "active"]),
-                "total_voucher_inaktif": len(vouchers[vouchers["status"] == "inactive"]),
-                "total_voucher_habis": len(vouchers[vouchers["balance"] <= 0]),  
-                "total_voucher_terpakai": len(transactions["code"].unique()),
-                "total_saldo_belum_terpakai": vouchers["balance"].sum(),
-                "total_saldo_sudah_terpakai": vouchers["used_value"].sum(),
-            }
-        
 
-            col1, col2, col3 = st.columns(3)
-            col1.metric("🎫 Total Kupon Dijual", summary["total_voucher_dijual"])
-            col2.metric("📌 Kupon Aktif", summary["total_voucher_aktif"])
-            col3.metric("🚫 Kupon Inaktif", summary["total_voucher_inaktif"])
-        
-            col4, col5, col6 = st.columns(3)
-            col4.metric("🔥 Kupon Habis", summary["total_voucher_habis"])  # 🔴 Tambahan
-            col5.metric("💸 Saldo Sudah Terpakai", f"Rp {summary['total_saldo_sudah_terpakai']:,.0f}")
-            col6.metric("💰 Saldo Belum Terpakai", f"Rp {summary['total_saldo_belum_terpakai']:,.0f}")
+                if st.button("Proses Seller Terpilih", key="btn_proses_seller"):
+                    acc_ids = edited_seller.loc[edited_seller["accept"], "id_seller"].tolist()
+                    del_ids = edited_seller.loc[edited_seller["hapus"], "id_seller"].tolist()
 
-            col7, _, _ = st.columns(3)
-            col7.metric("✅ Total Kupon Terpakai", summary["total_voucher_terpakai"])
+                    if set(acc_ids) & set(del_ids):
+                        st.error("Seller yang sama tidak boleh di-Accept dan di-Hapus sekaligus.")
+                    elif not acc_ids and not del_ids:
+                        st.warning("Belum ada seller yang dipilih.")
+                    else:
+                        # id_seller belum tentu unik (data lama, lihat
+                        # ensure_seller_index): hanya baris pending yang diubah
+                        try:
+                            with engine.begin() as conn2:
+                                if acc_ids:
+                                    conn2.execute(
+                                        text("""
+                                            UPDATE seller
+                                            SET status = 'diterima'
+                                            WHERE id_seller = ANY(:ids)
+                                              AND status = 'belum diterima'
+                                        """),
+                                        {"ids": acc_ids}
+                                    )
+                                if del_ids:
+                                    conn2.execute(
+                                        text("""
+                                            DELETE FROM seller
+                                            WHERE id_seller = ANY(:ids)
+                                              AND status = 'belum diterima'
+                                        """),
+                                        {"ids": del_ids}
+                                    )
+                            # cookie login seller dicek ulang ke status terbaru
+                            _seller_status.clear()
+                            st.success(f"{len(acc_ids)} seller diterima ✅, {len(del_ids)} dihapus ❌")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Gagal memproses data seller: {e}")
 
-            st.markdown("---")
-        
+        except Exception as e:
+            st.error("❌ Gagal mengambil data seller dari database.")
+            st.code(str(e))
+
+    with tab_aktivasi:
+        st.subheader("🎟️ Daftar Kupon Berstatus 'Proses'")
+        st.write("Berikut adalah daftar kupon yang masih dalam proses validasi.")
+
+        try:
+            # Ambil data kupon yang masih proses
+            with engine.connect() as conn:
+                df_voucher_pending = pd.read_sql("""
+                    SELECT 
+                        code,
+                        initial_value,
+                        status,
+                        seller,
+                        nama
+                    FROM public.vouchers
+                    WHERE status = 'proses'
+                    ORDER BY code ASC
+                """, conn)
 
-            if not transactions.empty:
-                redeem_daily = transactions.groupby(transactions["tanggal_transaksi"].dt.date).size()
-                st.subheader("📈 Penukaran Kupon per Hari")
-                st.line_chart(redeem_daily)
+            if df_voucher_pending.empty:
+                st.info("Belum ada kupon yang ingin diaktivasi.")
             else:
-                st.info("Belum ada transaksi untuk filter ini.")
-        
-            st.markdown("---")
-        
-            # ============================
-            # 📊 TOTAL NILAI TRANSAKSI PER HARI
-            # ============================
-            if not transactions.empty:
-                total_transaksi = transactions.groupby(transactions["tanggal_transaksi"].dt.date)["used_amount"].sum()
-                st.subheader("📊 Total Nilai Transaksi per Hari")
-                st.bar_chart(total_transaksi)
-        
-            st.markdown("---")
-        
-            # ============================
-            # 🧩 PIE CHART STATUS (TIDAK TERPENGARUH FILTER)
-            # ============================
-            st.subheader("🧩 Status Kupon (Semua Data)")
-            
-            status_count = vouchers["status"].value_counts().reset_index()
-            status_count.columns = ["status", "jumlah"]
-        
-            color_map = {
-                "active": "#23C552",
-                "habis": "#FF4646",
-                "inactive": "#A8A8A8",
-                "soldout": "#C60000"
-            }
-        
-            fig = px.pie(
-                status_count,
-                names="status",
-                values="jumlah",
-                title="Distribusi Status Kupon",
-                color="status",
-                color_discrete_map=color_map,
-                hole=0.35
-            )
-        
-            fig.update_layout(
-                legend_title="Status Kupon",
-                title_x=0.5,
-                margin=dict(t=40, b=10, l=10, r=10)
-            )
-        
-            st.plotly_chart(fig, use_container_width=False, width=500)
-        
-            st.markdown("---")
-        
-            # ============================
-            # 📥 EXPORT CSV (SETELAH FILTER)
-            # ============================
-            csv = vouchers.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                label="📥 Download Laporan Voucher (CSV)",
-                data=csv,
-                file_name="voucher_report.csv",
-                mime="text/csv",
+                df_voucher_pending.insert(0, "aktivasi", False)
+                df_voucher_pending.insert(1, "tolak", False)
+                edited_voucher = st.data_editor(
+                    df_voucher_pending,
+                    use_container_width=True,
+                    hide_index=True,
+                    disabled=["code", "initial_value", "status", "seller", "nama"],
+                    column_config={
+                        "aktivasi": st.column_config.CheckboxColumn("✅ Aktivasi"),
+                        "tolak": st.column_config.CheckboxColumn("🗑️ Tolak"),
+                        "code": "Kode Kupon",
+                        "initial_value": st.column_config.NumberColumn("Initial Value", format="Rp %d"),
+                        "status": "Status",
+                        "seller": "Seller",
+                        "nama": "Pembeli",
+                    },
+                    key="editor_voucher_pending",
+                )
+
+                if st.button("Proses Kupon Terpilih", key="btn_proses_kupon"):
+                    act_codes = edited_voucher.loc[edited_voucher["aktivasi"], "code"].tolist()
+                    rej_codes = edited_voucher.loc[edited_voucher["tolak"], "code"].tolist()
+
+                    if set(act_codes) & set(rej_codes):
+                        st.error("Kupon yang sama tidak boleh diaktivasi dan ditolak sekaligus.")
+                    elif not act_codes and not rej_codes:
+                        st.warning("Belum ada kupon yang dipilih.")
+                    else:
+                        try:
+                            with engine.begin() as conn2:
+                                if act_codes:
+                                    conn2.execute(
+                                        text("""
+                                            UPDATE vouchers
+                                            SET status = 'active', tanggal_aktivasi = :tanggal_aktivasi
+                                            WHERE code = ANY(:codes) AND status = 'proses'
+                                        """),
+                                        {"codes": act_codes, "tanggal_aktivasi": date.today()}
+                                    )
+                                if rej_codes:
+                                    conn2.execute(
+                                        text("""
+                                            UPDATE vouchers
+                                            SET status = 'inactive', nama = NULL, no_hp = NULL, tanggal_aktivasi = NULL
+                                            WHERE code = ANY(:codes) AND status = 'proses'
+                                        """),
+                                        {"codes": rej_codes}
+                                    )
+                            clear_voucher_cache()
+                            st.success(f"{len(act_codes)} kupon diaktivasi ✅, {len(rej_codes)} ditolak ❌")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Gagal memproses data kupon: {e}")
+
+        except Exception as e:
+            st.error("❌ Gagal mengambil data kupon dari database.")
+            st.code(str(e))
+
+# figure plotly hanya dibangun ulang kalau data ringkasannya berubah
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_status_pie(status_count):
+    color_map = {
+        "active": "#23C552",
+        "habis": "#FF4646",
+        "inactive": "#A8A8A8",
+        "soldout": "#C60000"
+    }
+
+    fig = px.pie(
+        status_count,
+        names="status",
+        values="jumlah",
+        title="Distribusi Status Kupon",
+        color="status",
+        color_discrete_map=color_map,
+        hole=0.35
+    )
+
+    fig.update_layout(
+        legend_title="Status Kupon",
+        title_x=0.5,
+        margin=dict(t=40, b=10, l=10, r=10)
+    )
+    return fig
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_seller_bar(status_pivot):
+    fig = px.bar(
+        status_pivot,
+        x="seller",
+        y=["active", "habis", "inactive"],
+        title="Distribusi Status Kupon per Seller",
+        color_discrete_map={
+            "active": "#2ecc71",   # Hijau
+            "habis": "#e74c3c",    # Merah
+            "inactive": "#bdc3c7"  # Abu-abu
+        }
+    )
+    fig.update_layout(
+        xaxis_tickangle=-30,
+        legend_title_text="Status"
+    )
+    return fig
+
+def _render_admin_laporan():
+    st.subheader("Laporan Warung")
+
+    # Tabs untuk membagi laporan
+    tab_voucher, tab_transaksi, tab_seller = st.tabs(["Kupon", "Transaksi", "Seller"])
+
+    # # ===== TAB Voucher =====
+    with tab_voucher:
+        st.subheader("📊 Laporan Kupon")
+
+        # ============================
+        # 🔍 FILTER
+        # ============================
+        with st.expander("🔎 Filter Laporan"):
+            colf1, colf2 = st.columns(2)
+
+            # Filter cabang
+            branch_filter = colf1.selectbox(
+                "Pilih Cabang",
+                ["Semua", "Sedati", "Tawangsari", "Kesambi", "Seller"]
             )
 
-    
-        # # ===== TAB Transaksi ====
-        with tab_transaksi:
-            st.subheader("📊 Ringkasan Transaksi")
-        
-            # Load data transaksi
-            df_tx = pd.read_sql("SELECT * FROM public.transactions", engine)
-        
-            if df_tx.empty:
-                st.info("Belum ada data transaksi.")
+            # Filter tanggal
+            tanggal_awal = colf1.date_input("Tanggal Awal", value=date.today().replace(day=1))
+            tanggal_akhir = colf2.date_input("Tanggal Akhir", value=date.today(), key="tanggal_akhir_laporan")
+
+        # filter cabang & tanggal dijalankan di SQL, kupon cukup ringkasan per status
+        status_summary = load_voucher_summary()
+        transactions = load_transactions(tanggal_awal, tanggal_akhir, branch_filter)
+        transactions["tanggal_transaksi"] = pd.to_datetime(transactions["tanggal_transaksi"], errors="coerce")
+
+        jumlah_status = status_summary.set_index("status")["jumlah"]
+
+        summary = {
+            "total_voucher_dijual": int(status_summary["jumlah"].sum()),
+            "total_voucher_aktif": int(jumlah_status.get("active", 0)),
+            "total_voucher_inaktif": int(jumlah_status.get("inactive", 0)),
+            "total_voucher_habis": int(status_summary["habis"].sum()),
+            "total_voucher_terpakai": transactions["code"].nunique(dropna=True),
+            "total_saldo_belum_terpakai": status_summary["saldo"].sum(),
+            "total_saldo_sudah_terpakai": status_summary["terpakai"].sum(),
+        }
+
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("🎫 Total Kupon Dijual", summary["total_voucher_dijual"])
+        col2.metric("📌 Kupon Aktif", summary["total_voucher_aktif"])
+        col3.metric("🚫 Kupon Inaktif", summary["total_voucher_inaktif"])
+
+        col4, col5, col6 = st.columns(3)
+        col4.metric("🔥 Kupon Habis", summary["total_voucher_habis"])  # 🔴 Tambahan
+        col5.metric("💸 Saldo Sudah Terpakai", f"Rp {summary['total_saldo_sudah_terpakai']:,.0f}")
+        col6.metric("💰 Saldo Belum Terpakai", f"Rp {summary['total_saldo_belum_terpakai']:,.0f}")
+
+        col7, _, _ = st.columns(3)
+        col7.metric("✅ Total Kupon Terpakai", summary["total_voucher_terpakai"])
+
+        st.markdown("---")
+
+
+        # kunci harian tetap datetime64 (floor), bukan objek date python
+        hari = transactions["tanggal_transaksi"].dt.floor("D")
+
+        if not transactions.empty:
+            redeem_daily = transactions.groupby(hari).size()
+            st.subheader("📈 Penukaran Kupon per Hari")
+            st.line_chart(redeem_daily)
+        else:
+            st.info("Belum ada transaksi untuk filter ini.")
+
+        st.markdown("---")
+
+        # ============================
+        # 📊 TOTAL NILAI TRANSAKSI PER HARI
+        # ============================
+        if not transactions.empty:
+            total_transaksi = transactions.groupby(hari)["used_amount"].sum()
+            st.subheader("📊 Total Nilai Transaksi per Hari")
+            st.bar_chart(total_transaksi)
+
+        st.markdown("---")
+
+        # ============================
+        # 🧩 PIE CHART STATUS (TIDAK TERPENGARUH FILTER)
+        # ============================
+        st.subheader("🧩 Status Kupon (Semua Data)")
+
+        # pakai ulang jumlah per status yang sudah dipakai untuk metric
+        status_count = (
+            jumlah_status[jumlah_status.index.notna()]
+            .sort_values(ascending=False)
+            .rename_axis("status")
+            .reset_index(name="jumlah")
+        )
+
+        fig = build_status_pie(status_count)
+        st.plotly_chart(fig, use_container_width=False, width=500)
+
+        st.markdown("---")
+
+        # ============================
+        # 📥 EXPORT CSV (SETELAH FILTER)
+        # ============================
+        # tabel kupon lengkap hanya ditarik kalau memang mau diunduh
+        if st.toggle("Siapkan file CSV kupon", key="laporan_csv_kupon"):
+            csv = load_vouchers_csv()
+            st.download_button(
+                label="📥 Download Laporan Voucher (CSV)",
+                data=csv,
+                file_name="voucher_report.csv",
+                mime="text/csv",
+            )
+
+
+    # # ===== TAB Transaksi ====
+    with tab_transaksi:
+        st.subheader("📊 Ringkasan Transaksi")
+
+        # cukup rentang tanggal & daftar cabang untuk isi filter
+        tgl_min, tgl_max, cabang_db = load_tx_filter_options()
+
+        if tgl_min is None:
+            st.info("Belum ada data transaksi.")
+        else:
+            # =============================================
+            # 🔍 FILTER AREA
+            # =============================================
+            st.markdown("### 🔎 Filter Transaksi")
+
+            # 4 kolom: Dari, Sampai, Cabang, Jenis Transaksi
+            f1, f2, f3, f4 = st.columns([1, 1, 1, 1])
+
+            # Filter tanggal "DARI"
+            with f1:
+                start_date = st.date_input(
+                    "Dari tanggal",
+                    tgl_min
+                )
+
+            # Filter tanggal "SAMPAI"
+            with f2:
+                end_date = st.date_input(
+                    "Sampai tanggal",
+                    tgl_max
+                )
+
+            # Filter CABANG
+            with f3:
+                cabang_list = ["Semua"] + cabang_db
+                selected_cabang = st.selectbox("Cabang", cabang_list)
+
+            # Filter JENIS TRANSAKSI (Kupon / Non Kupon)
+            with f4:
+                filter_kupon = st.selectbox(
+                    "Jenis transaksi",
+                    ["Semua", "Kupon", "Non Kupon"]
+                )
+
+            # =============================================
+            # 🔄 FILTER TANGGAL + CABANG + KUPON (di SQL)
+            # =============================================
+            # isvoucher_norm (1 = kupon) sudah dihitung di SELECT
+            df_filtered = load_transactions(start_date, end_date, selected_cabang, filter_kupon)
+
+            # =============================================
+            # CEK SETELAH SEMUA FILTER
+            # =============================================
+            if df_filtered.empty:
+                st.info("Tidak ada transaksi pada filter yang dipilih.")
             else:
-                # Pastikan kolom tanggal dalam bentuk datetime
-                df_tx["tanggal_transaksi"] = pd.to_datetime(df_tx["tanggal_transaksi"])
-        
-                # =============================================
-                # 🔍 FILTER AREA
-                # =============================================
-                st.markdown("### 🔎 Filter Transaksi")
-        
-                # 4 kolom: Dari, Sampai, Cabang, Jenis Transaksi
-                f1, f2, f3, f4 = st.columns([1, 1, 1, 1])
-        
-                # Filter tanggal "DARI"
-                with f1:
-                    start_date = st.date_input(
-                        "Dari tanggal",
-                        df_tx["tanggal_transaksi"].min().date()
-                    )
-        
-                # Filter tanggal "SAMPAI"
-                with f2:
-                    end_date = st.date_input(
-                        "Sampai tanggal",
-                        df_tx["tanggal_transaksi"].max().date()
-                    )
-        
-                # Filter CABANG
-                with f3:
-                    cabang_list = ["Semua"] + sorted(
-                        df_tx["branch"].dropna().unique().tolist()
-                    )
-                    selected_cabang = st.selectbox("Cabang", cabang_list)
-        
-                # Filter JENIS TRANSAKSI (Kupon / Non Kupon)
-                with f4:
-                    filter_kupon = st.selectbox(
-                        "Jenis transaksi",
-                        ["Semua", "Kupon", "Non Kupon"]
-                    )
-        
-                # =============================================
-                # 🔄 APPLY FILTER TANGGAL + CABANG
-                # =============================================
-                df_filtered = df_tx[
-                    (df_tx["tanggal_transaksi"].dt.date >= start_date) &
-                    (df_tx["tanggal_transaksi"].dt.date <= end_date)
-                ].copy()
-        
-                if selected_cabang != "Semua":
-                    df_filtered = df_filtered[df_filtered["branch"] == selected_cabang]
-        
-                # =============================================
-                # 🎫 NORMALISASI KUPON (kolom isvoucher: yes/no)
-                # =============================================
-                if not df_filtered.empty and "isvoucher" in df_filtered.columns:
-                    df_filtered["isvoucher_norm"] = (
-                        df_filtered["isvoucher"]
-                        .astype(str)
-                        .str.strip()
-                        .str.lower()
-                        .map({"yes": 1, "no": 0})
-                        .fillna(0)
-                        .astype(int)
-                    )
-        
-                    if filter_kupon == "Kupon":
-                        df_filtered = df_filtered[df_filtered["isvoucher_norm"] == 1]
-                    elif filter_kupon == "Non Kupon":
-                        df_filtered = df_filtered[df_filtered["isvoucher_norm"] == 0]
-                else:
-                    # Kalau kolom isvoucher tidak ada, bikin norm = 0
-                    if not df_filtered.empty:
-                        df_filtered["isvoucher_norm"] = 0
-        
+                # Pastikan used_amount numerik
+                df_filtered["used_amount"] = pd.to_numeric(
+                    df_filtered["used_amount"],
+                    errors="coerce"
+                ).fillna(0)
+
                 # =============================================
-                # CEK SETELAH SEMUA FILTER
+                # SUMMARY TRANSAKSI
                 # =============================================
-                if df_filtered.empty:
-                    st.info("Tidak ada transaksi pada filter yang dipilih.")
+                total_tx = len(df_filtered)
+                total_tx_nominal = df_filtered["used_amount"].sum()
+                avg_tx = df_filtered["used_amount"].mean() if total_tx > 0 else 0
+
+                st.write(f"- Total transaksi: {total_tx:,}")
+                st.write(f"- Total nominal digunakan: Rp {int(total_tx_nominal):,}")
+                st.write(f"- Rata-rata nominal transaksi: Rp {int(avg_tx):,}")
+
+                st.markdown("---")
+
+                # =======================================================
+                # 🏪 TRANSAKSI PER CABANG
+                # =======================================================
+                st.subheader("🏪 Total Transaksi per Cabang")
+
+                # agregasi group-by dikerjakan Postgres (hash aggregate)
+                per_cabang, top_voucher = load_tx_laporan_agg(
+                    start_date, end_date, selected_cabang, filter_kupon
+                )
+                st.bar_chart(per_cabang, x="Cabang", y="Jumlah Transaksi")
+
+                st.subheader("💰 Total Nominal per Cabang")
+                st.bar_chart(per_cabang, x="Cabang", y="Total Nominal")
+
+                st.markdown("---")
+
+                # =======================================================
+                # 🏆 TOP 5 KUPON PALING SERING DIPAKAI
+                # =======================================================
+                st.subheader("🏆 Top 5 Kupon Paling Sering Digunakan")
+
+                # Hanya transaksi kupon dengan code terisi
+                if top_voucher.empty:
+                    st.info("Tidak ada transaksi kupon pada filter ini.")
                 else:
-                    # Pastikan used_amount numerik
-                    df_filtered["used_amount"] = pd.to_numeric(
-                        df_filtered["used_amount"],
-                        errors="coerce"
-                    ).fillna(0)
-        
-                    # =============================================
-                    # SUMMARY TRANSAKSI
-                    # =============================================
-                    total_tx = len(df_filtered)
-                    total_tx_nominal = df_filtered["used_amount"].sum()
-                    avg_tx = df_filtered["used_amount"].mean() if total_tx > 0 else 0
-        
-                    st.write(f"- Total transaksi: {total_tx:,}")
-                    st.write(f"- Total nominal digunakan: Rp {int(total_tx_nominal):,}")
-                    st.write(f"- Rata-rata nominal transaksi: Rp {int(avg_tx):,}")
-        
-                    st.markdown("---")
-        
-                    # =======================================================
-                    # 🏪 TRANSAKSI PER CABANG
-                    # =======================================================
-                    st.subheader("🏪 Total Transaksi per Cabang")
-        
-                    # Pakai size() biar nggak tergantung kolom tertentu
-                    tx_count = (
-                        df_filtered.groupby("branch")
-                        .size()
-                        .reset_index(name="Jumlah Transaksi")
-                    )
-                    tx_count.rename(columns={"branch": "Cabang"}, inplace=True)
-                    st.bar_chart(tx_count, x="Cabang", y="Jumlah Transaksi")
-        
-                    st.subheader("💰 Total Nominal per Cabang")
-                    tx_sum = (
-                        df_filtered.groupby("branch")["used_amount"]
-                        .sum()
-                        .reset_index()
-                    )
-                    tx_sum.columns = ["Cabang", "Total Nominal"]
-                    st.bar_chart(tx_sum, x="Cabang", y="Total Nominal")
-        
-                    st.markdown("---")
-        
-                    # =======================================================
-                    # 🏆 TOP 5 KUPON PALING SERING DIPAKAI
-                    # =======================================================
-                    st.subheader("🏆 Top 5 Kupon Paling Sering Digunakan")
-        
-                    # Hanya ambil transaksi yang memang kupon
-                    df_voucher = df_filtered[df_filtered["isvoucher_norm"] == 1].copy()
-        
-                    # Buang code kosong / null
-                    df_voucher = df_voucher[
-                        df_voucher["code"].notna() & (df_voucher["code"] != "")
-                    ]
-        
-                    if df_voucher.empty:
-                        st.info("Tidak ada transaksi kupon pada filter ini.")
-                    else:
-                        top_voucher = (
-                            df_voucher.groupby("code")["code"]
-                            .count()
-                            .sort_values(ascending=False)
-                            .head(5)
-                            .reset_index(name="Jumlah Transaksi")
-                        )
-        
-                        st.table(top_voucher)
-                        st.bar_chart(top_voucher, x="code", y="Jumlah Transaksi")
-        
-                    st.markdown("---")
-        
-                    # =======================================================
-                    # 📥 DOWNLOAD DATA TRANSAKSI TERFILTER
-                    # =======================================================
-                    st.subheader("📥 Download Data Transaksi")
-        
-                    csv_data = df_filtered.to_csv(index=False).encode("utf-8")
-        
+                    st.table(top_voucher)
+                    st.bar_chart(top_voucher, x="code", y="Jumlah Transaksi")
+
+                st.markdown("---")
+
+                # =======================================================
+                # 📥 DOWNLOAD DATA TRANSAKSI TERFILTER
+                # =======================================================
+                st.subheader("📥 Download Data Transaksi")
+
+                # CSV hanya dibuat kalau memang mau diunduh
+                if st.toggle("Siapkan file CSV transaksi", key="laporan_csv_transaksi"):
+                    csv_data = load_transactions_csv(start_date, end_date, selected_cabang, filter_kupon)
+
                     st.download_button(
                         label="📥 Download Transaksi (CSV)",
                         data=csv_data,
@@ -2221,866 +2665,889 @@ def page_admin():
                         mime="text/csv"
                     )
 
-            # ===== TAB Seller =====
-            with tab_seller:
-                st.subheader("📊 Analisis Kupon per Seller")
-            
-                if "seller" not in df_vouchers.columns:
-                    st.warning("Kolom 'seller' tidak tersedia.")
-                else:
-                    df_vouchers["seller"] = df_vouchers["seller"].fillna("-")
-                    df_seller_only = df_vouchers[df_vouchers["seller"] != "-"].copy()
-                
-                    if df_seller_only.empty:
-                        st.info("Belum ada kupon yang dibawa seller.")
-                    else:
-                        # --- Normalize status for clean analytics ---
-                        df_seller_only["status_clean"] = (
-                            df_seller_only["status"].astype(str).str.lower().replace({
-                                "sold out": "habis"
-                            })
-                        )
-                    
-                        status_pivot = (
-                            df_seller_only.pivot_table(
-                                index="seller",
-                                columns="status_clean",
-                                values="code",
-                                aggfunc="count",
-                                fill_value=0
-                            )
-                            .reset_index()
-                        )
-                    
-                        # Pastikan kolom lengkap
-                        for col in ["active", "habis", "inactive"]:
-                            if col not in status_pivot.columns:
-                                status_pivot[col] = 0
-                    
-                        status_pivot["Total"] = status_pivot[["active", "habis", "inactive"]].sum(axis=1)
-                        status_pivot = status_pivot.sort_values(by="Total", ascending=False)
-                    
-                        st.dataframe(status_pivot, use_container_width=True)
-                    
-                        fig = px.bar(
-                            status_pivot,
-                            x="seller",
-                            y=["active", "habis", "inactive"],
-                            title="Distribusi Status Kupon per Seller",
-                            color_discrete_map={
-                                "active": "#2ecc71",   # Hijau
-                                "habis": "#e74c3c",    # Merah
-                                "inactive": "#bdc3c7"  # Abu-abu
-                            }
-                        )
-                        fig.update_layout(
-                            xaxis_tickangle=-30,
-                            legend_title_text="Status"
-                        )
-                        st.plotly_chart(fig, use_container_width=True) 
-    with tab_menu:
-        st.subheader("Kelola Menu")
-        tab1, tab2, tab3 = st.tabs(["📋 Lihat Menu", "➕ Tambah Menu", "✏️ Edit / Hapus Menu"])
-        
-        # ============================
-        # TAB 1 — LIST MENU
-        # ============================
-        with tab1:
-            st.subheader("📋 Daftar Menu")
-            st.markdown("### 🔎 Filter")
-        
-            col1 = st.columns(1)[0]
-        
-            # Ambil menu dulu supaya kategori diambil dari sumber yang sama
-            df_menu = get_full_menu()
-        
-            with col1:
-                kategori_list = ["Semua"] + sorted(df_menu["kategori"].dropna().unique().tolist())
-                kategori = st.selectbox("Kategori", kategori_list)
-        
-            # Terapkan filter
-            if kategori != "Semua":
-                df_menu = df_menu[df_menu["kategori"] == kategori]
-        
-            st.dataframe(df_menu, use_container_width=True, height=500)
+        # ===== TAB Seller =====
+        with tab_seller:
+            st.subheader("📊 Analisis Kupon per Seller")
+
+            # hitungan seller x status sudah di-group di DB, tinggal pivot
+            seller_status = load_seller_status()
+
+            if seller_status.empty:
+                st.info("Belum ada kupon yang dibawa seller.")
+            else:
+                status_pivot = (
+                    seller_status.pivot(index="seller", columns="status_clean", values="n")
+                    .fillna(0)
+                    .astype(int)
+                    .rename_axis(columns=None)
+                    .reset_index()
+                )
+
+                # Pastikan kolom lengkap
+                for col in ["active", "habis", "inactive"]:
+                    if col not in status_pivot.columns:
+                        status_pivot[col] = 0
+
+                status_pivot["Total"] = status_pivot[["active", "habis", "inactive"]].sum(axis=1)
+                status_pivot = status_pivot.sort_values(by="Total", ascending=False)
+
+                st.dataframe(status_pivot, use_container_width=True)
+
+                fig = build_seller_bar(status_pivot)
+                st.plotly_chart(fig, use_container_width=True) 
+
+# urutan + label kolom tabel Histori (kunci = nama kolom di frame)
+HISTORI_KOLOM = {
+    "id": "id",
+    "tanggal_transaksi": "Tanggal transaksi",
+    "kupon": "kupon digunakan",
+    "code": "Kode",
+    "initial_value": "Saldo awal",
+    "sisa_saldo": "Sisa saldo",
+    "total": "Total",
+    "tunai": "Tunai",
+    "diskon": "Diskon",
+    "branch": "Cabang",
+    "items": "Menu",
+}
+
+def _render_admin_histori():
+    st.subheader("Histori Transaksi")
+
+    # =============================
+    # FILTER INPUT
+    # =============================
+    today = date.today()
+
+    default_start_date = today.replace(day=1)
+    min_date = date(2020, 1, 1) 
+    max_date = today
+    col1, col2, col3, col4, col5 = st.columns([2, 1.3, 1.3, 1.3, 1.3])
+    with col1:
+        search_code = st.text_input("Cari kode kupon", "").strip()
+    with col2:
+        start_date = st.date_input(
+            "Tanggal Mulai",
+            value=max_date,
+            min_value=min_date,
+            max_value=max_date
+        )
+    with col3:
+        end_date = st.date_input(
+            "Tanggal Akhir", 
+            value=max_date,
+            min_value=min_date,
+            max_value=max_date
+        )
+    with col4:
+        filter_cabang = st.selectbox("Filter Cabang", ["semua", "Sedati", "Tawangsari", "Kesambi", "Seller"])
+    with col5:
+        filter_kupon = st.selectbox("Filter Kupon", ["semua", "Kupon", "Non Kupon"])
+
+    # =============================
+    # FILTER DATA (di SQL)
+    # =============================
+    tx_filter = dict(
+        branch=filter_cabang,
+        isvoucher=None if filter_kupon == "semua" else ("yes" if filter_kupon == "Kupon" else "no"),
+        code=search_code,
+    )
+    totals = _load_tx_totals(start_date, end_date, **tx_filter)
 
-        with tab2:
-            st.header("➕ Tambah Menu Baru")
+    if totals["n"] == 0:
+        st.warning("Tidak ada data sesuai filter.")
+    else:
+        # =============================
+        # METRIK (agregat dari DB, bukan dari baris)
+        # =============================
+        total_uang = totals["total_uang"]
+        total_cash = totals["total_cash"]
+        total_kupon = total_uang - total_cash
+        total_diskon = totals["total_diskon"]
 
-            kategori = get_kategori_list()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total Pendapatan", f"Rp {total_uang:,}")
+        c2.metric("Cash", f"Rp {total_cash:,}")
+        c3.metric("Kupon", f"Rp {total_kupon:,}")
+        c4.metric("Diskon", f"Rp {int(total_diskon):,}")
 
-            options = ["-- Pilih Kategori --"] + kategori + ["+ Tambah kategori baru"]
+        # =============================
+        # DETAIL KUPON (JIKA SEARCH)
+        # =============================
+        if search_code:
+            st.subheader(f"Detail Kupon: {search_code.upper()}")
 
-            kategori_selected = st.selectbox(
-                "Kategori",
-                options=options,
-                index=0,
-                key="kategori_tambah_select",
+            initial_val = totals["initial_value"] or 0
+            st.write(f"- Saldo awal: Rp {initial_val:,}")
+            st.write(f"- Jumlah transaksi: {totals['n']}")
+            st.write(f"- Total terpakai: Rp {total_uang:,}")
+
+            st.markdown("---")
+
+        # default hanya ringkasan; baris transaksi baru diambil kalau tabel
+        # detail memang dinyalakan
+        if st.toggle("Tampilkan tabel transaksi & penjualan menu", value=False, key="histori_detail"):
+            df_filt = _load_tx(start_date, end_date, **tx_filter)
+
+            # ringkasan di atas dari semua baris, tabel dibatasi LIMIT _load_tx
+            if len(df_filt) < totals["n"]:
+                st.caption(
+                    f"Tabel, sisa saldo & penjualan menu hanya memuat {len(df_filt):,} "
+                    f"transaksi terbaru dari {totals['n']:,}; ringkasan di atas "
+                    "dihitung dari semua transaksi."
+                )
+
+            # =============================
+            # TABEL HISTORI (WAJIB MENU)
+            # =============================
+            # nama kolom tetap nama DB; label tampil lewat HISTORI_KOLOM
+            # (column_config), jadi frame tidak perlu di-rename/disalin
+            df_hist = df_filt
+
+            # non kupon: Total = Tunai; diskon positif ditambahkan
+            is_kupon = df_hist["isvoucher"] == "yes"
+            df_hist["total"] = df_hist["used_amount"].where(is_kupon, df_hist["tunai"]) + df_hist["diskon"].clip(lower=0)
+            df_hist["kupon"] = is_kupon.astype(int).astype(str)
+
+            # Hitung sisa saldo: saldo awal - total terpakai kumulatif per kode
+            # (urut id naik); Total tidak pernah negatif jadi clip di akhir
+            # sama dengan max(.., 0) di tiap langkah.
+            # _load_tx sudah ORDER BY id DESC -> cukup dibalik, tanpa sort
+            df_calc = df_hist.iloc[::-1]
+            sub = df_calc[df_calc["kupon"] == "1"]
+            used_cum = sub.groupby("code")["total"].cumsum()
+            df_hist["sisa_saldo"] = None
+            df_hist.loc[sub.index, "sisa_saldo"] = (sub["initial_value"] - used_cum).clip(lower=0)
+
+            # hanya satu halaman yang dikirim ke browser
+            pg1, pg2 = st.columns([1, 1])
+            with pg1:
+                page_size = st.selectbox("Baris per halaman", [50, 100, 500], index=0, key="histori_page_size")
+            n_pages = max(1, math.ceil(len(df_hist) / page_size))
+            # nilai awal lewat session_state (bukan value=) supaya tidak bentrok;
+            # filter berubah -> jumlah halaman bisa menyusut
+            st.session_state.setdefault("histori_page", 1)
+            if st.session_state["histori_page"] > n_pages:
+                st.session_state["histori_page"] = n_pages
+            with pg2:
+                page = st.number_input(
+                    f"Halaman (dari {n_pages})", min_value=1, max_value=n_pages, key="histori_page"
+                )
+            offset = (int(page) - 1) * page_size
+
+            st.dataframe(
+                df_hist.iloc[offset:offset + page_size][list(HISTORI_KOLOM)],
+                column_config=HISTORI_KOLOM,
+                use_container_width=True
             )
 
-            kategori_value = None
+            # =============================
+            # PENJUALAN MENU (SESUSAI FILTER / KODE)
+            # =============================
+            # satu baris per item ("Nama x2"), diparse sekaligus satu kolom
+            items = df_filt["items"].fillna("").str.split(",").explode().str.strip()
+            df_menu = items.str.extract(_MENU_RE).dropna()
 
-            if kategori_selected == "+ Tambah kategori baru":
-                kategori_value = st.text_input(
-                    "Kategori baru",
-                    key="kategori_tambah_baru"
+            if not df_menu.empty:
+                df_menu["Menu"] = df_menu["Menu"].str.strip().str.title().astype("category")
+                df_menu["Jumlah"] = df_menu["Jumlah"].astype(int)
+                st.subheader("📊 Penjualan Per Menu")
+                st.dataframe(
+                    df_menu.groupby("Menu", as_index=False, observed=True)["Jumlah"].sum(),
+                    use_container_width=True
                 )
-            elif kategori_selected != "-- Pilih Kategori --":
-                kategori_value = kategori_selected
-
-            nama_item = st.text_input("Nama Item")
-            keterangan = st.text_area("Keterangan")
-            satuan = st.selectbox(
-                "Satuan",
-                ["pcs", "kg"],
-                index=0,
-                key="satuan_tambah"
+
+def _render_admin_menu():
+    st.subheader("Kelola Menu")
+    tab1, tab2, tab3 = st.tabs(["📋 Lihat Menu", "➕ Tambah Menu", "✏️ Edit / Hapus Menu"])
+
+    # ============================
+    # TAB 1 — LIST MENU
+    # ============================
+    with tab1:
+        st.subheader("📋 Daftar Menu")
+        st.markdown("### 🔎 Filter")
+
+        col1 = st.columns(1)[0]
+
+        # Ambil menu dulu supaya kategori diambil dari sumber yang sama
+        df_menu = get_full_menu()
+
+        with col1:
+            kategori_list = ["Semua"] + sorted(df_menu["kategori"].dropna().unique().tolist())
+            kategori = st.selectbox("Kategori", kategori_list)
+
+        # Terapkan filter
+        if kategori != "Semua":
+            df_menu = df_menu[df_menu["kategori"] == kategori]
+
+        st.dataframe(df_menu, use_container_width=True, height=500)
+
+    with tab2:
+        st.header("➕ Tambah Menu Baru")
+
+        kategori = get_kategori_list()
+
+        options = ["-- Pilih Kategori --"] + kategori + ["+ Tambah kategori baru"]
+
+        kategori_selected = st.selectbox(
+            "Kategori",
+            options=options,
+            index=0,
+            key="kategori_tambah_select",
+        )
+
+        kategori_value = None
+
+        if kategori_selected == "+ Tambah kategori baru":
+            kategori_value = st.text_input(
+                "Kategori baru",
+                key="kategori_tambah_baru"
             )
+        elif kategori_selected != "-- Pilih Kategori --":
+            kategori_value = kategori_selected
+
+        nama_item = st.text_input("Nama Item")
+        keterangan = st.text_area("Keterangan")
+        satuan = st.selectbox(
+            "Satuan",
+            ["pcs", "kg"],
+            index=0,
+            key="satuan_tambah"
+        )
 
 
 
-            harga_sedati = st.text_input("Harga Sedati (boleh kosong)")
-            harga_twsari = st.text_input("Harga Tawangsari (boleh kosong)")
-            harga_kesambi = st.text_input("Harga Kesambi (boleh kosong)")
-            harga_seller = st.text_input("Harga Seller (boleh kosong)")
+        harga_sedati = st.text_input("Harga Sedati (boleh kosong)")
+        harga_twsari = st.text_input("Harga Tawangsari (boleh kosong)")
+        harga_kesambi = st.text_input("Harga Kesambi (boleh kosong)")
+        harga_seller = st.text_input("Harga Seller (boleh kosong)")
 
-            if st.button("Simpan Menu"):
-                if not kategori_value:
-                    st.error("Kategori belum dipilih / diisi.")
-                else:
-                    add_menu_item(
-                        kategori=kategori_value,
-                        nama_item=nama_item,
-                        keterangan=keterangan,
-                        satuan=satuan,
-                        harga_sedati=harga_sedati,
-                        harga_twsari=harga_twsari,
-                        harga_kesambi=harga_kesambi,
-                        harga_seller=harga_seller,
-                    )
-                    st.success("Menu berhasil ditambahkan!")
-                    st.rerun()
+        if st.button("Simpan Menu"):
+            if not kategori_value:
+                st.error("Kategori belum dipilih / diisi.")
+            else:
+                add_menu_item(
+                    kategori=kategori_value,
+                    nama_item=nama_item,
+                    keterangan=keterangan,
+                    satuan=satuan,
+                    harga_sedati=harga_sedati,
+                    harga_twsari=harga_twsari,
+                    harga_kesambi=harga_kesambi,
+                    harga_seller=harga_seller,
+                )
+                st.success("Menu berhasil ditambahkan!")
+                st.rerun()
 
-        with tab3:
-            st.header("✏️ Edit atau Hapus Menu")
+    with tab3:
+        st.header("✏️ Edit atau Hapus Menu")
 
-            tab21, tab22 = st.tabs(["Edit Menu", "Edit Kategori"])
-            with tab21:
-                menu_list = list_all_menu()
-            
-                if not menu_list:
-                    st.info("Belum ada menu untuk diedit.")
-                else:
-                    kategori_list = sorted(set(m["kategori"] for m in menu_list))
-                    pilih_kategori = st.selectbox(
-                        "Pilih Kategori",
-                        kategori_list,
-                        key="edit_pilih_kategori"
-                    )
-                    menu_filtered = [m for m in menu_list if m["kategori"] == pilih_kategori]
-            
-                    pilih_menu = st.selectbox(
-                        "Pilih Menu",
-                        [(m["id_menu"], m["nama_item"]) for m in menu_filtered],
-                        format_func=lambda x: x[1],
-                        key="edit_pilih_menu"
-                    )
-            
-                    id_menu = pilih_menu[0]
-                    selected = next(m for m in menu_list if m["id_menu"] == id_menu)
-            
-                    st.divider()
-                    kategori = st.text_input("Kategori", value=selected["kategori"])
-                    nama_item = st.text_input("Nama Item", value=selected["nama_item"])
-                    keterangan = st.text_area("Keterangan", value=selected["keterangan"])
-            
-                    satuan_options = ["pcs", "kg"]
-                    default_satuan = (selected.get("satuan") or "pcs").lower()
-                    satuan = st.selectbox(
-                        "Satuan",
-                        satuan_options,
-                        index=satuan_options.index(default_satuan)
-                            if default_satuan in satuan_options else 0,
-                        key=f"satuan_edit_{id_menu}"
-                    )
-            
-                    status_options = ["aktif", "inaktif"]
-                    default_status = (selected.get("status") or "").strip().lower()
-                    default_index = (
-                        status_options.index(default_status)
-                        if default_status in status_options
-                        else 0
-                    )
-                    status = st.selectbox(
-                        "Status",
-                        status_options,
-                        index=default_index,
-                        key=f"status_menu_{id_menu}"
-                    )
-            
-                    harga_sedati   = st.text_input("Harga Sedati",     value=str(selected["harga_sedati"]   or ""))
-                    harga_twsari   = st.text_input("Harga Tawangsari", value=str(selected["harga_twsari"]   or ""))
-                    harga_kesambi  = st.text_input("Harga Kesambi",    value=str(selected["harga_kesambi"]  or ""))
-                    harga_seller = st.text_input("Harga Seller",   value=str(selected["harga_seller"] or ""))
-            
-                    col1, col2 = st.columns(2)
-            
-                    with col1:
-                        if st.button("Simpan Perubahan"):
-                            update_menu_item(
-                                id_menu, kategori, nama_item, keterangan,
-                                harga_sedati, harga_twsari, harga_kesambi, harga_seller, status, satuan
-                            )
-                            st.success("Menu berhasil diperbarui!")
-                            st.rerun()
-            
-                    with col2:
-                        if st.button("Hapus Menu"):
-                            delete_menu_item(id_menu)
-                            st.warning("Menu berhasil dihapus!")
-                            st.rerun()
-        
-            with tab22:
-                kategori_list = list_all_kategori()
-                 
-                if not kategori_list:
-                    st.info("Belum ada kategori untuk diedit.")
-                else:
-                    # Mapping aman (id → label)
-                    options = {
-                        m["id_kategori"]: f"{m['nama_kategori']} - {m['status_kategori']}"
-                        for m in kategori_list
-                    }
-            
-                    pilih_id = st.selectbox(
-                        "Pilih kategori yang akan diedit",
-                        options.keys(),
-                        format_func=lambda k: options[k]
-                    )
+        tab21, tab22 = st.tabs(["Edit Menu", "Edit Kategori"])
+        with tab21:
+            menu_list = list_all_menu()
 
-                    selected_id = next(m["id_kategori"] for m in kategori_list if m["id_kategori"] == pilih_id)
-                    selected_kategori = next(m for m in kategori_list if m["id_kategori"] == pilih_id)
-            
-                    kategori_options = ["aktif", "inaktif"]
-                    default_kategori = (selected_kategori.get("status_kategori") or "").strip().lower()
-            
-                    status_kategori_new = st.selectbox(
-                        "Status",
-                        kategori_options,
-                        index=kategori_options.index(default_kategori),
-                        key=f"edit_status_{selected_id}"
-                    )
-            
-                    if st.button("Simpan Perubahan", key=f"simpan_kategori_{selected_id}"):
-                        update_kategori_menu(
-                            pilih_id, status_kategori_new
-                        )
-                        st.success("Kategori berhasil diperbarui!")
-                        st.rerun()
-                 
-    with tab_kupon:
-        st.subheader("🎫 Buat Kupon Baru")
+            if not menu_list:
+                st.info("Belum ada menu untuk diedit.")
+            else:
+                kategori_list = sorted(set(m["kategori"] for m in menu_list))
+                pilih_kategori = st.selectbox(
+                    "Pilih Kategori",
+                    kategori_list,
+                    key="edit_pilih_kategori"
+                )
+                menu_filtered = [m for m in menu_list if m["kategori"] == pilih_kategori]
 
-        jenis_list = []
-        with engine.connect() as conn:
-            df_jenis = pd.read_sql("SELECT jenis_kupon FROM public.jenis_db", conn)
-            jenis_list = df_jenis['jenis_kupon'].tolist()
+                pilih_menu = st.selectbox(
+                    "Pilih Menu",
+                    [(m["id_menu"], m["nama_item"]) for m in menu_filtered],
+                    format_func=lambda x: x[1],
+                    key="edit_pilih_menu"
+                )
 
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            jenis_kupon = st.text_input("Jenis Kupon (contoh: Reguler, Promo, Makanan)")
-            initial_value = st.number_input("Initial Value", min_value=0)
-            jumlah_kode = st.number_input("Jumlah Kupon yang Dibuat", min_value=1, value=1)
+                id_menu = pilih_menu[0]
+                selected = next(m for m in menu_list if m["id_menu"] == id_menu)
+
+                st.divider()
+                kategori = st.text_input("Kategori", value=selected["kategori"])
+                nama_item = st.text_input("Nama Item", value=selected["nama_item"])
+                keterangan = st.text_area("Keterangan", value=selected["keterangan"])
+
+                satuan_options = ["pcs", "kg"]
+                default_satuan = (selected.get("satuan") or "pcs").lower()
+                satuan = st.selectbox(
+                    "Satuan",
+                    satuan_options,
+                    index=satuan_options.index(default_satuan)
+                        if default_satuan in satuan_options else 0,
+                    key=f"satuan_edit_{id_menu}"
+                )
 
-        with col2:
-            awal_berlaku = st.date_input("Tanggal Awal Berlaku")
-            akhir_berlaku = st.date_input("Tanggal Akhir Berlaku")
+                status_options = ["aktif", "inaktif"]
+                default_status = (selected.get("status") or "").strip().lower()
+                default_index = (
+                    status_options.index(default_status)
+                    if default_status in status_options
+                    else 0
+                )
+                status = st.selectbox(
+                    "Status",
+                    status_options,
+                    index=default_index,
+                    key=f"status_menu_{id_menu}"
+                )
 
-        if st.button("🚀 Generate Kupon"):
-            if akhir_berlaku < awal_berlaku:
-                st.error("Tanggal akhir tidak boleh lebih awal dari tanggal mulai!")
-                st.stop()
+                harga_sedati   = st.text_input("Harga Sedati",     value=str(selected["harga_sedati"]   or ""))
+                harga_twsari   = st.text_input("Harga Tawangsari", value=str(selected["harga_twsari"]   or ""))
+                harga_kesambi  = st.text_input("Harga Kesambi",    value=str(selected["harga_kesambi"]  or ""))
+                harga_seller = st.text_input("Harga Seller",   value=str(selected["harga_seller"] or ""))
 
-            if jenis_kupon.strip() == "":
-                st.error("Jenis kupon wajib diisi!")
-                st.stop()
+                col1, col2 = st.columns(2)
 
-            insert_jenis_if_not_exists(jenis_kupon, awal_berlaku, akhir_berlaku)
+                with col1:
+                    if st.button("Simpan Perubahan"):
+                        update_menu_item(
+                            id_menu, kategori, nama_item, keterangan,
+                            harga_sedati, harga_twsari, harga_kesambi, harga_seller, status, satuan
+                        )
+                        st.success("Menu berhasil diperbarui!")
+                        st.rerun()
 
-            created_codes = []
+                with col2:
+                    if st.button("Hapus Menu"):
+                        delete_menu_item(id_menu)
+                        st.warning("Menu berhasil dihapus!")
+                        st.rerun()
 
-            for _ in range(jumlah_kode):
-                new_code = generate_code(6)   
+        with tab22:
+            kategori_list = list_all_kategori()
 
-                while kode_exists(new_code):
-                    new_code = generate_code(6)
+            if not kategori_list:
+                st.info("Belum ada kategori untuk diedit.")
+            else:
+                # Mapping aman (id → label)
+                options = {
+                    m["id_kategori"]: f"{m['nama_kategori']} - {m['status_kategori']}"
+                    for m in kategori_list
+                }
 
-                insert_voucher(
-                    new_code,
-                    initial_value,
-                    jenis_kupon,
-                    awal_berlaku,
-                    akhir_berlaku
+                pilih_id = st.selectbox(
+                    "Pilih kategori yang akan diedit",
+                    options.keys(),
+                    format_func=lambda k: options[k]
                 )
 
-                created_codes.append(new_code)
-
-            st.success(f"{len(created_codes)} kupon berhasil dibuat! 🎉")
-
-            # Tampilan kode kupon ala kartu
-            st.markdown("### 🎟️ Kode Kupon Baru")
-
-            for c in created_codes:
-                st.markdown(
-                    f"""
-                    <div style="
-                        padding:10px 18px;
-                        background:#f0f2f6;
-                        border-radius:8px;
-                        border:1px solid #d9d9d9;
-                        width:220px;
-                        margin-bottom:6px;
-                        font-size:20px;
-                        font-weight:600;
-                        letter-spacing:2px;
-                        text-align:center;
-                    ">
-                    {c}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
+                selected_id = next(m["id_kategori"] for m in kategori_list if m["id_kategori"] == pilih_id)
+                selected_kategori = next(m for m in kategori_list if m["id_kategori"] == pilih_id)
+
+                kategori_options = ["aktif", "inaktif"]
+                default_kategori = (selected_kategori.get("status_kategori") or "").strip().lower()
+
+                status_kategori_new = st.selectbox(
+                    "Status",
+                    kategori_options,
+                    index=kategori_options.index(default_kategori),
+                    key=f"edit_status_{selected_id}"
                 )
 
-    with tab_lock:
-        st.subheader("🔒 close day")
-        f1, f2 = st.columns([1, 1])
-        with f2:
-            cabang_filter = st.selectbox(
-                "Cabang (filter)",
-                ["Semua", "Sedati", "Tawangsari", "Kesambi", "Seller"],
-                key="draft_cbg_filter"
-            )
-        last_date = get_last_draft_date(engine, cabang_filter)
-        if st.session_state.get("_last_cbg_filter") != cabang_filter:
-            st.session_state["_last_cbg_filter"] = cabang_filter
-            st.session_state["draft_tgl_admin"] = last_date or date.today()
+                if st.button("Simpan Perubahan", key=f"simpan_kategori_{selected_id}"):
+                    update_kategori_menu(
+                        pilih_id, status_kategori_new
+                    )
+                    st.success("Kategori berhasil diperbarui!")
+                    st.rerun()
+
+# gaya kartu kode kupon baru (dipakai sekali untuk semua kartu)
+KUPON_CARD_CSS = """
+<style>
+.kupon-card {
+    padding:10px 18px;
+    background:#f0f2f6;
+    border-radius:8px;
+    border:1px solid #d9d9d9;
+    width:220px;
+    margin-bottom:6px;
+    font-size:20px;
+    font-weight:600;
+    letter-spacing:2px;
+    text-align:center;
+}
+</style>
+"""
+
+def _render_admin_jenis_kupon():
+    st.subheader("🎫 Buat Kupon Baru")
+
+    jenis_list = []
+    with engine.connect() as conn:
+        df_jenis = pd.read_sql("SELECT jenis_kupon FROM public.jenis_db", conn)
+        jenis_list = df_jenis['jenis_kupon'].tolist()
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        jenis_kupon = st.text_input("Jenis Kupon (contoh: Reguler, Promo, Makanan)")
+        initial_value = st.number_input("Initial Value", min_value=0)
+        jumlah_kode = st.number_input("Jumlah Kupon yang Dibuat", min_value=1, value=1)
+
+    with col2:
+        awal_berlaku = st.date_input("Tanggal Awal Berlaku")
+        akhir_berlaku = st.date_input("Tanggal Akhir Berlaku")
+
+    if st.button("🚀 Generate Kupon"):
+        if akhir_berlaku < awal_berlaku:
+            st.error("Tanggal akhir tidak boleh lebih awal dari tanggal mulai!")
+            st.stop()
+
+        if jenis_kupon.strip() == "":
+            st.error("Jenis kupon wajib diisi!")
+            st.stop()
+
+        insert_jenis_if_not_exists(jenis_kupon, awal_berlaku, akhir_berlaku)
+
+        created_codes = create_vouchers(
+            int(jumlah_kode),
+            initial_value,
+            jenis_kupon,
+            awal_berlaku,
+            akhir_berlaku
+        )
+
+        st.success(f"{len(created_codes)} kupon berhasil dibuat! 🎉")
+
+        # Tampilan kode kupon ala kartu
+        st.markdown("### 🎟️ Kode Kupon Baru")
+
+        # semua kartu dirender sekali (satu elemen), bukan satu markdown per kode
+        render_html(KUPON_CARD_CSS + "".join(
+            f'<div class="kupon-card">{c}</div>' for c in created_codes
+        ))
+
+def _render_admin_lock():
+    st.subheader("🔒 close day")
+    f1, f2 = st.columns([1, 1])
+    with f2:
+        cabang_filter = st.selectbox(
+            "Cabang (filter)",
+            ["Semua", "Sedati", "Tawangsari", "Kesambi", "Seller"],
+            key="draft_cbg_filter"
+        )
+    last_date = get_last_draft_date(engine, cabang_filter)
+    if st.session_state.get("_last_cbg_filter") != cabang_filter:
+        st.session_state["_last_cbg_filter"] = cabang_filter
+        st.session_state["draft_tgl_admin"] = last_date or date.today()
+
+    with f1:
+        tgl = st.date_input("Tanggal Transaksi", key="draft_tgl_admin")
+
+    # =========================
+    # LOAD DRAFT (BELUM LOCK)
+    # =========================
+    with engine.connect() as conn:
+        q = """
+        SELECT *
+        FROM public.transactions_draft
+        WHERE is_locked = false
+          AND tanggal_transaksi = :tgl
+        """
+        params = {"tgl": tgl}
+        if cabang_filter != "Semua":
+            q += " AND branch = :b"
+            params["b"] = cabang_filter
+        q += " ORDER BY id DESC"
+        df_draft = pd.read_sql(text(q), conn, params=params)
+
+    st.markdown("### 📋 Daftar Transaksi")
+    if df_draft.empty:
+        st.info("Tidak ada transaksi untuk tanggal/filter ini.")
+    else:
+        st.dataframe(
+            df_draft[["id", "tanggal_transaksi", "branch", "used_amount", "tunai", "isvoucher", "code", "diskon", "items"]],
+            use_container_width=True,
+            height=260
+        )
+
+        st.write("")
+        if st.button("🔒 SIMPAN SEMUA TRANSAKSI DI ATAS", type="primary", use_container_width=True, key="btn_lock_all"):
+            try:
+                ids_to_lock = df_draft["id"].tolist()
+
+                for did in ids_to_lock:
+                    lock_draft_to_final(int(did), locked_by="admin")
+
+                st.success(f"Berhasil Menyimpan {len(ids_to_lock)} Transaksi.")
+                st.rerun()
+
+            except Exception as e:
+                st.error("Gagal Menyimpan semua Transaksi.")
+                st.code(str(e))
+
 
-        with f1:
-            tgl = st.date_input("Tanggal Transaksi", key="draft_tgl_admin")
-    
         # =========================
-        # LOAD DRAFT (BELUM LOCK)
+        # PILIH DRAFT
         # =========================
-        with engine.connect() as conn:
-            q = """
-            SELECT *
-            FROM public.transactions_draft
-            WHERE is_locked = false
-              AND tanggal_transaksi = :tgl
-            """
-            params = {"tgl": tgl}
-            if cabang_filter != "Semua":
-                q += " AND branch = :b"
-                params["b"] = cabang_filter
-            q += " ORDER BY id DESC"
-            df_draft = pd.read_sql(text(q), conn, params=params)
-    
-        st.markdown("### 📋 Daftar Transaksi")
-        if df_draft.empty:
-            st.info("Tidak ada transaksi untuk tanggal/filter ini.")
-        else:
-            st.dataframe(
-                df_draft[["id", "tanggal_transaksi", "branch", "used_amount", "tunai", "isvoucher", "code", "diskon", "items"]],
-                use_container_width=True,
-                height=260
+        st.markdown("### ✏️ Pilih Transaksi untuk Diedit")
+        draft_id = st.selectbox(
+            "Transaksi ID",
+            df_draft["id"].tolist(),
+            format_func=lambda x: f"Draft #{x}",
+            key="draft_pick_edit"
+        )
+        row = df_draft[df_draft["id"] == draft_id].iloc[0]
+
+        # Key unik per draft utk editor items & angka biar aman
+        items_key     = f"items_editor_{draft_id}"
+        diskon_key    = f"edit_diskon_{draft_id}"
+        tunai_key     = f"edit_tunai_{draft_id}"
+        code_key      = f"edit_code_{draft_id}"
+        kw_key        = f"kw_voucher_{draft_id}"
+        sel_code_key  = f"sel_voucher_{draft_id}"
+        tgl_key       = f"edit_tgl_{draft_id}"
+        branch_key    = f"edit_branch_{draft_id}"
+
+        kupon_key = "edit_kupon_global"
+
+        last_draft = st.session_state.get("_last_draft_id")
+        if last_draft != draft_id:
+            st.session_state["_last_draft_id"] = draft_id
+
+            # normalize nilai dari db
+            row_isvoucher = str(row.get("isvoucher") or "no").strip().lower()
+            if row_isvoucher not in ("yes", "no"):
+                row_isvoucher = "no"
+
+            st.session_state[kupon_key] = row_isvoucher
+
+            # juga sync code select (biar gak kebawa dari draft sebelumnya)
+            st.session_state[code_key] = (row.get("code") or "").strip()
+            st.session_state[sel_code_key] = (row.get("code") or "").strip() or "-- pilih kupon --"
+
+        # =========================
+        # HEADER
+        # =========================
+        branch_options = ["Sedati", "Tawangsari", "Kesambi", "Seller"]
+        branch_now = str(row.get("branch") or "")
+        if branch_now and branch_now not in branch_options:
+            branch_options = [branch_now] + branch_options
+
+        code_db = (row.get("code") or "").strip()
+
+        st.markdown("### 🧾 Status Transaksi")
+        c1, c2, c3, c4 = st.columns([1.2, 1.2, 1, 1])
+
+        with c1:
+            branch = st.selectbox(
+                "Cabang",
+                branch_options,
+                index=branch_options.index(branch_now) if branch_now in branch_options else 0,
+                key=branch_key
             )
-        
-            st.write("")
-            if st.button("🔒 SIMPAN SEMUA TRANSAKSI DI ATAS", type="primary", use_container_width=True, key="btn_lock_all"):
-                try:
-                    ids_to_lock = df_draft["id"].tolist()
-            
-                    for did in ids_to_lock:
-                        lock_draft_to_final(int(did), locked_by="admin")
-            
-                    st.success(f"Berhasil Menyimpan {len(ids_to_lock)} Transaksi.")
-                    st.rerun()
-            
-                except Exception as e:
-                    st.error("Gagal Menyimpan semua Transaksi.")
-                    st.code(str(e))
-    
-        
-            # =========================
-            # PILIH DRAFT
-            # =========================
-            st.markdown("### ✏️ Pilih Transaksi untuk Diedit")
-            draft_id = st.selectbox(
-                "Transaksi ID",
-                df_draft["id"].tolist(),
-                format_func=lambda x: f"Draft #{x}",
-                key="draft_pick_edit"
+
+        with c2:
+            tanggal_transaksi = st.date_input(
+                "Tanggal",
+                value=row["tanggal_transaksi"],
+                key=tgl_key
             )
-            row = df_draft[df_draft["id"] == draft_id].iloc[0]
-            
-            # Key unik per draft utk editor items & angka biar aman
-            items_key     = f"items_editor_{draft_id}"
-            diskon_key    = f"edit_diskon_{draft_id}"
-            tunai_key     = f"edit_tunai_{draft_id}"
-            code_key      = f"edit_code_{draft_id}"
-            kw_key        = f"kw_voucher_{draft_id}"
-            sel_code_key  = f"sel_voucher_{draft_id}"
-            tgl_key       = f"edit_tgl_{draft_id}"
-            branch_key    = f"edit_branch_{draft_id}"
-            
-            kupon_key = "edit_kupon_global"
 
-            last_draft = st.session_state.get("_last_draft_id")
-            if last_draft != draft_id:
-                st.session_state["_last_draft_id"] = draft_id
-            
-                # normalize nilai dari db
-                row_isvoucher = str(row.get("isvoucher") or "no").strip().lower()
-                if row_isvoucher not in ("yes", "no"):
-                    row_isvoucher = "no"
-            
-                st.session_state[kupon_key] = row_isvoucher
-            
-                # juga sync code select (biar gak kebawa dari draft sebelumnya)
-                st.session_state[code_key] = (row.get("code") or "").strip()
-                st.session_state[sel_code_key] = (row.get("code") or "").strip() or "-- pilih kupon --"
-            
-            # =========================
-            # HEADER
-            # =========================
-            branch_options = ["Sedati", "Tawangsari", "Kesambi", "Seller"]
-            branch_now = str(row.get("branch") or "")
-            if branch_now and branch_now not in branch_options:
-                branch_options = [branch_now] + branch_options
-            
-            code_db = (row.get("code") or "").strip()
-            
-            st.markdown("### 🧾 Status Transaksi")
-            c1, c2, c3, c4 = st.columns([1.2, 1.2, 1, 1])
-            
-            with c1:
-                branch = st.selectbox(
-                    "Cabang",
-                    branch_options,
-                    index=branch_options.index(branch_now) if branch_now in branch_options else 0,
-                    key=branch_key
-                )
-            
-            with c2:
-                tanggal_transaksi = st.date_input(
-                    "Tanggal",
-                    value=row["tanggal_transaksi"],
-                    key=tgl_key
-                )
-            
-            with c3:
-                # tetap yes/no (string)
-                isvoucher = st.selectbox(
-                    "Kupon?",
-                    ["no", "yes"],
-                    index=0 if st.session_state.get(kupon_key, "no") == "no" else 1,
-                    key=kupon_key
-                )
-            
-            with c4:
-                diskon = st.number_input(
-                    "Diskon",
-                    min_value=0.0,
-                    step=1000.0,
-                    value=float(st.session_state.get(diskon_key, row.get("diskon") or 0)),
-                    key=diskon_key
-                )
-            
-            price_map, menu_options = get_price_map_for_branch(branch)
-            
-            st.markdown("### 🍽️ Edit Transaksi")
-            df_items = parse_items_str(row.get("items", ""))
-            if df_items.empty:
-                df_items = pd.DataFrame([{"menu": "", "qty": 0.0}], columns=["menu", "qty"])
-            
-            edited = st.data_editor(
-                df_items,
-                use_container_width=True,
-                num_rows="dynamic",
-                column_config={
-                    "menu": st.column_config.SelectboxColumn(
-                        "Menu",
-                        options=menu_options,
-                        required=False,
-                    ),
-                    "qty": st.column_config.NumberColumn(
-                        "Qty",
-                        min_value=0.0,
-                        step=1.0,
-                        format="%.2f",
-                    ),
-                },
-                key=items_key
+        with c3:
+            # tetap yes/no (string)
+            isvoucher = st.selectbox(
+                "Kupon?",
+                ["no", "yes"],
+                index=0 if st.session_state.get(kupon_key, "no") == "no" else 1,
+                key=kupon_key
             )
-            
-            # =========================
-            # HITUNG SUBTOTAL + TOTAL
-            # =========================
+
+        with c4:
+            diskon = st.number_input(
+                "Diskon",
+                min_value=0.0,
+                step=1000.0,
+                value=float(st.session_state.get(diskon_key, row.get("diskon") or 0)),
+                key=diskon_key
+            )
+
+        price_map, menu_options = get_price_map_for_branch(branch)
+
+        st.markdown("### 🍽️ Edit Transaksi")
+        df_items = parse_items_str(row.get("items", ""))
+        if df_items.empty:
+            df_items = pd.DataFrame([{"menu": "", "qty": 0.0}], columns=["menu", "qty"])
+
+        edited = st.data_editor(
+            df_items,
+            use_container_width=True,
+            num_rows="dynamic",
+            column_config={
+                "menu": st.column_config.SelectboxColumn(
+                    "Menu",
+                    options=menu_options,
+                    required=False,
+                ),
+                "qty": st.column_config.NumberColumn(
+                    "Qty",
+                    min_value=0.0,
+                    step=1.0,
+                    format="%.2f",
+                ),
+            },
+            key=items_key
+        )
+
+        # =========================
+        # HITUNG SUBTOTAL + TOTAL
+        # =========================
+        subtotal = 0.0
+        for _, r in edited.iterrows():
+            menu = str(r.get("menu") or "").strip()
+            if not menu:
+                continue
+            try:
+                qty = float(r.get("qty", 0))
+            except:
+                qty = 0.0
+            if qty <= 0 or math.isnan(qty):
+                continue
+            harga = float(price_map.get(menu, 0) or 0)
+            subtotal += harga * qty
+
+        if math.isnan(subtotal) or math.isinf(subtotal):
             subtotal = 0.0
-            for _, r in edited.iterrows():
-                menu = str(r.get("menu") or "").strip()
-                if not menu:
-                    continue
-                try:
-                    qty = float(r.get("qty", 0))
-                except:
-                    qty = 0.0
-                if qty <= 0 or math.isnan(qty):
-                    continue
-                harga = float(price_map.get(menu, 0) or 0)
-                subtotal += harga * qty
-            
-            if math.isnan(subtotal) or math.isinf(subtotal):
-                subtotal = 0.0
-            
-            st.info(f"Subtotal (menu x qty): Rp {int(round(subtotal)):,}")
-            
-            total_bersih = max(subtotal - float(diskon), 0.0)
-            st.success(f"Total bersih (subtotal - diskon): Rp {int(round(total_bersih)):,}")
-            
-            # =========================
-            # KUPON + TUNAI AUTO
-            # =========================
-            if isvoucher == "no":
-                # ✅ NON-KUPON: paksa reset kupon biar DB gak nyangkut
+
+        st.info(f"Subtotal (menu x qty): Rp {int(round(subtotal)):,}")
+
+        total_bersih = max(subtotal - float(diskon), 0.0)
+        st.success(f"Total bersih (subtotal - diskon): Rp {int(round(total_bersih)):,}")
+
+        # =========================
+        # KUPON + TUNAI AUTO
+        # =========================
+        if isvoucher == "no":
+            # ✅ NON-KUPON: paksa reset kupon biar DB gak nyangkut
+            st.session_state[code_key] = ""
+            st.session_state[sel_code_key] = "-- pilih kupon --"
+            st.session_state[tunai_key] = float(total_bersih)
+
+            st.number_input(
+                "Tunai (cash dibayar) — otomatis = total",
+                min_value=0.0,
+                step=1000.0,
+                value=float(st.session_state[tunai_key]),
+                key=tunai_key,
+                disabled=True
+            )
+
+        else:
+            st.markdown("### 🎟️ Edit Kupon")
+            kw = st.text_input("Cari kode kupon", value="", key=kw_key).strip()
+
+            options = search_active_voucher(engine, kw)
+            code_list = ["-- pilih kupon --"] + [c for c, _ in options]
+
+            default_code = (st.session_state.get(code_key) or code_db).strip()
+            if default_code and default_code not in code_list:
+                code_list = [default_code] + code_list
+
+            selected_code = st.selectbox(
+                "Pilih kode kupon (ketik untuk cari)",
+                code_list,
+                index=code_list.index(default_code) if default_code in code_list else 0,
+                key=sel_code_key
+            )
+
+            if selected_code == "-- pilih kupon --":
+                st.warning("Pilih kode kupon dulu.")
                 st.session_state[code_key] = ""
-                st.session_state[sel_code_key] = "-- pilih kupon --"
                 st.session_state[tunai_key] = float(total_bersih)
-            
                 st.number_input(
-                    "Tunai (cash dibayar) — otomatis = total",
+                    "Tunai (cash dibayar)",
                     min_value=0.0,
                     step=1000.0,
                     value=float(st.session_state[tunai_key]),
                     key=tunai_key,
                     disabled=True
                 )
-            
             else:
-                st.markdown("### 🎟️ Edit Kupon")
-                kw = st.text_input("Cari kode kupon", value="", key=kw_key).strip()
-            
-                options = search_active_voucher(engine, kw)
-                code_list = ["-- pilih kupon --"] + [c for c, _ in options]
-            
-                default_code = (st.session_state.get(code_key) or code_db).strip()
-                if default_code and default_code not in code_list:
-                    code_list = [default_code] + code_list
-            
-                selected_code = st.selectbox(
-                    "Pilih kode kupon (ketik untuk cari)",
-                    code_list,
-                    index=code_list.index(default_code) if default_code in code_list else 0,
-                    key=sel_code_key
-                )
-            
-                if selected_code == "-- pilih kupon --":
-                    st.warning("Pilih kode kupon dulu.")
-                    st.session_state[code_key] = ""
-                    st.session_state[tunai_key] = float(total_bersih)
-                    st.number_input(
-                        "Tunai (cash dibayar)",
-                        min_value=0.0,
-                        step=1000.0,
-                        value=float(st.session_state[tunai_key]),
-                        key=tunai_key,
-                        disabled=True
-                    )
+                st.session_state[code_key] = selected_code
+
+                bal, status = get_voucher_balance(engine, selected_code)
+                if bal is None:
+                    st.error("Kode kupon tidak ditemukan.")
+                    bal = 0
                 else:
-                    st.session_state[code_key] = selected_code
-            
-                    bal, status = get_voucher_balance(engine, selected_code)
-                    if bal is None:
-                        st.error("Kode kupon tidak ditemukan.")
-                        bal = 0
-                    else:
-                        st.info(f"Saldo kupon: Rp {bal:,} | Status: {status}")
-            
-                    shortage = max(float(total_bersih) - float(bal), 0.0)
-                    st.session_state[tunai_key] = float(shortage)
-            
-                    st.number_input(
-                        "Total",
-                        min_value=0.0,
-                        step=1000.0,
-                        value=float(st.session_state[tunai_key]),
-                        key=tunai_key,
-                        disabled=True
-                    )
-            
-            # =========================
-            # ACTION BUTTONS
-            # =========================
-            st.markdown("---")
-            colA, colB, colC = st.columns(3)
-            
-            with colA:
-                if st.button("🗑️ Hapus Transaksi Ini", use_container_width=True, key=f"btn_del_{draft_id}"):
-                    try:
-                        with engine.begin() as conn:
-                            conn.execute(text("""
-                                DELETE FROM public.transactions_draft
-                                WHERE id=:id AND is_locked=false
-                            """), {"id": int(draft_id)})
-            
-                        st.warning("Draft berhasil dihapus.")
-                        st.rerun()
-                    except Exception as e:
-                        st.error("Gagal hapus draft.")
-                        st.code(str(e))
-            
-            with colB:
-                if st.button("💾 Simpan Transaksi ini", type="primary", use_container_width=True, key=f"btn_save_{draft_id}"):
-            
-                    # final isvoucher tetap string yes/no
-                    final_isvoucher = "yes" if isvoucher == "yes" else "no"
-            
-                    # validasi + tentukan code
-                    final_code = None
-                    if final_isvoucher == "yes":
-                        c = (st.session_state.get(code_key) or "").strip()
-                        if not c:
-                            st.error("Jika menggunakan kupon, anda wajib memasukan nomor kupon valid.")
-                            st.stop()
-                        final_code = c
-                    else:
-                        # non-kupon: paksa null
-                        final_code = None
-            
-                    items_str = serialize_items_df(edited)
-            
+                    st.info(f"Saldo kupon: Rp {bal:,} | Status: {status}")
+
+                shortage = max(float(total_bersih) - float(bal), 0.0)
+                st.session_state[tunai_key] = float(shortage)
+
+                st.number_input(
+                    "Total",
+                    min_value=0.0,
+                    step=1000.0,
+                    value=float(st.session_state[tunai_key]),
+                    key=tunai_key,
+                    disabled=True
+                )
+
+        # =========================
+        # ACTION BUTTONS
+        # =========================
+        st.markdown("---")
+        colA, colB, colC = st.columns(3)
+
+        with colA:
+            if st.button("🗑️ Hapus Transaksi Ini", use_container_width=True, key=f"btn_del_{draft_id}"):
+                try:
                     with engine.begin() as conn:
                         conn.execute(text("""
-                            UPDATE public.transactions_draft
-                            SET branch=:branch,
-                                tanggal_transaksi=:tgl,
-                                items=:items,
-                                used_amount=:used_amount,
-                                tunai=:tunai,
-                                isvoucher=:isvoucher,
-                                code=:code,
-                                diskon=:diskon,
-                                updated_at=NOW()
+                            DELETE FROM public.transactions_draft
                             WHERE id=:id AND is_locked=false
-                        """), {
-                            "branch": branch,
-                            "tgl": tanggal_transaksi,
-                            "items": items_str,
-                            "used_amount": float(total_bersih),
-                            "tunai": float(st.session_state.get(tunai_key, 0)),
-                            "isvoucher": final_isvoucher,   # ✅ "yes"/"no"
-                            "code": final_code,             # ✅ NULL kalau non-kupon
-                            "diskon": float(diskon),
-                            "id": int(draft_id),
-                        })
-            
-                    st.success("Transaksi tersimpan.")
-                    st.rerun()
-            
-            with colC:
-                if st.button("🔒 Simpan Transaksi Ini", use_container_width=True, key=f"btn_lock_{draft_id}"):
-            
-                    # kalau kupon wajib pilih code sebelum lock
-                    if isvoucher == "yes":
-                        c = (st.session_state.get(code_key) or code_db).strip()
-                        if not c:
-                            st.error("Sebelum menyimpan wajib memilih kupon dulu.")
-                            st.stop()
-            
-                    lock_draft_to_final(draft_id, locked_by="admin")
-                    st.success("Transaksi disimpan.")
-                    st.rerun()
-
-    with tab_histori:
-        st.subheader("Histori Transaksi")
+                        """), {"id": int(draft_id)})
 
-        df_tx = list_transactions(limit=5000)
-        df_tx = df_tx.sort_values(by="id", ascending=False).reset_index(drop=True)
+                    st.warning("Draft berhasil dihapus.")
+                    st.rerun()
+                except Exception as e:
+                    st.error("Gagal hapus draft.")
+                    st.code(str(e))
 
-        if df_tx.empty:
-            st.info("Belum ada transaksi")
-            st.stop()
+        with colB:
+            if st.button("💾 Simpan Transaksi ini", type="primary", use_container_width=True, key=f"btn_save_{draft_id}"):
 
-        # =============================
-        # NORMALISASI DASAR
-        # =============================
-        df_tx["tanggal_transaksi"] = pd.to_datetime(df_tx["tanggal_transaksi"]).dt.date
-        df_tx["code"] = df_tx["code"].fillna("")
-        df_tx["isvoucher"] = df_tx["isvoucher"].fillna("no")
-        df_tx["diskon"] = pd.to_numeric(df_tx["diskon"], errors="coerce").fillna(0)
+                # final isvoucher tetap string yes/no
+                final_isvoucher = "yes" if isvoucher == "yes" else "no"
 
-        min_date = df_tx["tanggal_transaksi"].min()
-        max_date = df_tx["tanggal_transaksi"].max()
+                # validasi + tentukan code
+                final_code = None
+                if final_isvoucher == "yes":
+                    c = (st.session_state.get(code_key) or "").strip()
+                    if not c:
+                        st.error("Jika menggunakan kupon, anda wajib memasukan nomor kupon valid.")
+                        st.stop()
+                    final_code = c
+                else:
+                    # non-kupon: paksa null
+                    final_code = None
 
-        # =============================
-        # FILTER INPUT
-        # =============================
-        today = date.today()
+                items_str = serialize_items_df(edited)
+
+                with engine.begin() as conn:
+                    conn.execute(text("""
+                        UPDATE public.transactions_draft
+                        SET branch=:branch,
+                            tanggal_transaksi=:tgl,
+                            items=:items,
+                            used_amount=:used_amount,
+                            tunai=:tunai,
+                            isvoucher=:isvoucher,
+                            code=:code,
+                            diskon=:diskon,
+                            updated_at=NOW()
+                        WHERE id=:id AND is_locked=false
+                    """), {
+                        "branch": branch,
+                        "tgl": tanggal_transaksi,
+                        "items": items_str,
+                        "used_amount": float(total_bersih),
+                        "tunai": float(st.session_state.get(tunai_key, 0)),
+                        "isvoucher": final_isvoucher,   # ✅ "yes"/"no"
+                        "code": final_code,             # ✅ NULL kalau non-kupon
+                        "diskon": float(diskon),
+                        "id": int(draft_id),
+                    })
+
+                st.success("Transaksi tersimpan.")
+                st.rerun()
 
-        default_start_date = today.replace(day=1)
-        min_date = date(2020, 1, 1) 
-        max_date = today
-        col1, col2, col3, col4, col5 = st.columns([2, 1.3, 1.3, 1.3, 1.3])
-        with col1:
-            search_code = st.text_input("Cari kode kupon", "").strip()
-        with col2:
-            start_date = st.date_input(
-                "Tanggal Mulai",
-                value=max_date,
-                min_value=min_date,
-                max_value=max_date
-            )
-        with col3:
-            end_date = st.date_input(
-                "Tanggal Akhir", 
-                value=max_date,
-                min_value=min_date,
-                max_value=max_date
-            )
-        with col4:
-            filter_cabang = st.selectbox("Filter Cabang", ["semua", "Sedati", "Tawangsari", "Kesambi", "Seller"])
-        with col5:
-            filter_kupon = st.selectbox("Filter Kupon", ["semua", "Kupon", "Non Kupon"])
+        with colC:
+            if st.button("🔒 Simpan Transaksi Ini", use_container_width=True, key=f"btn_lock_{draft_id}"):
 
-        # =============================
-        # FILTER DATA
-        # =============================
-        df_filt = df_tx[
-            (df_tx["tanggal_transaksi"] >= start_date) &
-            (df_tx["tanggal_transaksi"] <= end_date)
-        ]
+                # kalau kupon wajib pilih code sebelum lock
+                if isvoucher == "yes":
+                    c = (st.session_state.get(code_key) or code_db).strip()
+                    if not c:
+                        st.error("Sebelum menyimpan wajib memilih kupon dulu.")
+                        st.stop()
 
-        if filter_cabang != "semua":
-            df_filt = df_filt[df_filt["branch"] == filter_cabang]
+                lock_draft_to_final(draft_id, locked_by="admin")
+                st.success("Transaksi disimpan.")
+                st.rerun()
 
-        if filter_kupon != "semua":
-            df_filt = df_filt[df_filt["isvoucher"] == ("yes" if filter_kupon == "Kupon" else "no")]
+# menu admin -> fungsi render; hanya menu yang dipilih yang dijalankan
+# (st.tabs menjalankan isi semua tab di setiap rerun)
+ADMIN_TABS = {
+    "Informasi Kupon": _render_admin_kupon,
+    "Edit Seller": _render_admin_seller,
+    "Laporan warung": _render_admin_laporan,
+    "Histori": _render_admin_histori,
+    "Kelola Menu": _render_admin_menu,
+    "Kelola Kupon": _render_admin_jenis_kupon,
+    "🔒 Lock Transaksi": _render_admin_lock,
+}
 
-        if search_code:
-            df_filt = df_filt[
-                (df_filt["isvoucher"] == "yes") &
-                (df_filt["code"].str.contains(search_code.upper(), case=False, na=False))
-            ]
-        
-        if df_filt.empty:
-            st.warning("Tidak ada data sesuai filter.")
-        else:
-            # =============================
-            # METRIK
-            # =============================
-            total_uang = df_filt["used_amount"].sum()
-            total_cash = df_filt["tunai"].sum()
-            total_kupon = total_uang - total_cash
-            total_diskon = df_filt["diskon"].sum()
-    
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Total Pendapatan", f"Rp {total_uang:,}")
-            c2.metric("Cash", f"Rp {total_cash:,}")
-            c3.metric("Kupon", f"Rp {total_kupon:,}")
-            c4.metric("Diskon", f"Rp {int(total_diskon):,}")
-    
-            # =============================
-            # DETAIL KUPON (JIKA SEARCH)
-            # =============================
-            if search_code:
-                st.subheader(f"Detail Kupon: {search_code.upper()}")
-    
-                initial_val = df_filt["initial_value"].iloc[0]
-                st.write(f"- Saldo awal: Rp {initial_val:,}")
-                st.write(f"- Jumlah transaksi: {len(df_filt)}")
-                st.write(f"- Total terpakai: Rp {df_filt['used_amount'].sum():,}")
-    
-                st.markdown("---")
-    
-            # =============================
-            # TABEL HISTORI (WAJIB MENU)
-            # =============================
-            df_hist = df_filt.rename(columns={
-                "tanggal_transaksi": "Tanggal transaksi",
-                "code": "Kode",
-                "used_amount": "Total",
-                "initial_value": "Saldo awal",
-                "branch": "Cabang",
-                "items": "Menu",
-                "tunai": "Tunai",
-                "isvoucher": "kupon digunakan",
-                "diskon": "Diskon"
-            })
-    
-            df_hist["kupon digunakan"] = df_hist["kupon digunakan"].apply(lambda x: "1" if x == "yes" else "0")
-            df_hist.loc[df_hist["kupon digunakan"] == "0", "Total"] = df_hist["Tunai"]
-            df_hist.loc[df_hist["Diskon"] > 0, "Total"] += df_hist["Diskon"]
-    
-            # Hitung sisa saldo
-            df_calc = df_hist.sort_values("id")
-            saldo_map = {}
-            df_calc["Sisa saldo"] = None
-    
-            for i, r in df_calc.iterrows():
-                if r["kupon digunakan"] != "1":
-                    continue
-                kode = r["Kode"]
-                saldo = r["Saldo awal"] if kode not in saldo_map else saldo_map[kode]
-                saldo = max(saldo - r["Total"], 0)
-                saldo_map[kode] = saldo
-                df_calc.at[i, "Sisa saldo"] = saldo
-    
-            df_hist["Sisa saldo"] = df_calc.sort_values("id", ascending=False)["Sisa saldo"].values
-    
-            st.dataframe(
-                df_hist[[
-                    "id",
-                    "Tanggal transaksi",
-                    "kupon digunakan",
-                    "Kode",
-                    "Saldo awal",
-                    "Sisa saldo",
-                    "Total",
-                    "Tunai",
-                    "Diskon",
-                    "Cabang",
-                    "Menu"
-                ]],
-                use_container_width=True
-            )
-    
-            # =============================
-            # PENJUALAN MENU (SESUSAI FILTER / KODE)
-            # =============================
-            menu_rows = []
-    
-            for _, row in df_filt.iterrows():
-                for item in str(row["items"]).split(","):
-                    m = re.match(r"(.+?)\s*[xX]\s*(\d+)", item.strip())
-                    if m:
-                        menu_rows.append({
-                            "Menu": m.group(1).strip().title(),
-                            "Jumlah": int(m.group(2))
-                        })
-    
-            df_menu = pd.DataFrame(menu_rows)
-    
-            if not df_menu.empty:
-                st.subheader("📊 Penjualan Per Menu")
-                st.dataframe(
-                    df_menu.groupby("Menu")["Jumlah"].sum().reset_index(),
-                    use_container_width=True
-                )
+def page_admin():
+    st.header("Halaman Admin")
+    show_back_to_login_button("admin")
+    active = st.radio(
+        "Menu Admin",
+        list(ADMIN_TABS),
+        horizontal=True,
+        key="admin_tab",
+        label_visibility="collapsed",
+    )
+    ADMIN_TABS[active]()
 
 # ---------------------------
 # Page: Seller Activation (seller-only)
 # ---------------------------
+# satu kupon per input kode: index UPPER(code) tidak unik, jadi varian
+# huruf besar/kecil dipilih satu saja (yang persis sama didahulukan)
+SEL_KODE_VOUCHER = """
+    SELECT code FROM public.vouchers
+    WHERE UPPER(code) = UPPER(:code)
+    ORDER BY (code = :code) DESC, code
+    LIMIT 1
+"""
+
+# update hanya kalau kupon milik seller ini dan belum active
+UPD_AKTIVASI_SELLER = text(f"""
+    UPDATE public.vouchers
+    SET nama = :nama,
+        no_hp = :no_hp,
+        status = 'proses'
+    WHERE code = ({SEL_KODE_VOUCHER})
+      AND seller = :seller
+      AND TRIM(seller) <> ''
+      AND LOWER(COALESCE(status, '')) <> 'active'
+    RETURNING code
+""")
+SEL_VOUCHER_OWNER = text(f"SELECT seller, status FROM public.vouchers WHERE code = ({SEL_KODE_VOUCHER})")
+
+# pesan Lacak kupon per status: (fungsi tampil, template)
+LACAK_STATUS = {
+    "active": (st.success, "Kupon berkode {code} Rp. {initial_value}, berstatus {status} dengan tanggal aktivasi: {tanggal_aktivasi}."),
+    "proses": (st.info, "Kupon berkode {code} Rp. {initial_value}, berstatus {status}. Segera bayar kupon agar dapat diaktivasi oleh admin."),
+    "inactive": (st.info, "Kupon berkode {code} Rp. {initial_value}, berstatus {status}. Aktivasi kupon ditolak oleh admin, hubungi admin untuk info lebih lanjut."),
+}
+LACAK_STATUS_LAIN = (st.info, "Kupon sedang berstatus {status}.")
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _lookup_voucher(code):
+    """Data Lacak kupon; dibuang lewat clear_voucher_cache setiap ada tulis."""
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT 
+                code,
+                initial_value,
+                status,
+                tanggal_aktivasi
+            FROM public.vouchers
+            WHERE UPPER(code) = UPPER(:code)
+            ORDER BY (code = :code) DESC, code
+            LIMIT 1
+        """), {"code": code}).fetchone()
+    return tuple(row) if row else None
+
 def page_seller_activation():
     st.header("Halaman Seller")
     show_back_to_login_button("seller")
@@ -3109,57 +3576,48 @@ def page_seller_activation():
 
         try:
             with engine.begin() as conn:
-                # Cek apakah voucher ada dan seller cocok
-                result = conn.execute(
-                    text("""
-                        SELECT seller, status 
-                        FROM public.vouchers 
-                        WHERE code = :code
-                    """),
-                    {"code": kode}
-                ).fetchone()
+                # jalur normal: cek seller/status + update dalam satu statement
+                updated = conn.execute(UPD_AKTIVASI_SELLER, {
+                    "nama": buyer_name_input,
+                    "no_hp": buyer_phone_input,
+                    "code": kode,
+                    "seller": st.session_state.nama_seller,
+                }).fetchone()
+
+                # tidak ada baris ter-update: cari tahu alasannya untuk pesan error
+                if not updated:
+                    result = conn.execute(SEL_VOUCHER_OWNER, {"code": kode}).fetchone()
+
+                    if not result:
+                        st.error("Kode kupon tidak ditemukan.")
+                        return
 
-                if not result:
-                    st.error("Kode kupon tidak ditemukan.")
-                    return
+                    db_seller, db_status = result
 
-                db_seller, db_status = result
+                    # Jika voucher belum diassign seller oleh admin
+                    if not db_seller or db_seller.strip() == "":
+                        st.error("Kupon belum diserahkan ke seller mana pun. Aktivasi ditolak.")
+                        return
 
-                # Jika voucher belum diassign seller oleh admin
-                if not db_seller or db_seller.strip() == "":
-                    st.error("Kupon belum diserahkan ke seller mana pun. Aktivasi ditolak.")
-                    return
+                    # Jika seller input tidak cocok dengan seller di database
+                    if db_seller != st.session_state.nama_seller:
+                        st.error("Voucher bukan milik Anda.")
+                        return
 
-                # Jika seller input tidak cocok dengan seller di database
-                if db_seller != st.session_state.nama_seller:
-                    st.error("Voucher bukan milik Anda.")
-                    return
+                    # if tanggal_penjualan and tanggal_aktivasi < tanggal_penjualan:
+                    #     st.error(f"❌ Tanggal Aktivasi tidak boleh sebelum Tanggal Penjualan ({tanggal_penjualan})")
+                    #     tanggal_aktivasi = None  # opsional: reset nilai agar user pilih ulang
+                    #     return
 
-                # if tanggal_penjualan and tanggal_aktivasi < tanggal_penjualan:
-                #     st.error(f"❌ Tanggal Aktivasi tidak boleh sebelum Tanggal Penjualan ({tanggal_penjualan})")
-                #     tanggal_aktivasi = None  # opsional: reset nilai agar user pilih ulang
-                #     return
+                    # Jika sudah aktif sebelumnya
+                    if db_status and db_status.lower() == "active":
+                        st.warning("Kupon ini sudah diaktivasi sebelumnya.")
+                        return
 
-                # Jika sudah aktif sebelumnya
-                if db_status and db_status.lower() == "active":
-                    st.warning("Kupon ini sudah diaktivasi sebelumnya.")
+                    # berubah di antara UPDATE dan SELECT; minta seller coba lagi
+                    st.error("Kupon sedang diproses, silakan coba lagi.")
                     return
-
-                # Update data voucher
-                conn.execute(
-                    text("""
-                        UPDATE public.vouchers
-                        SET nama = :nama,
-                            no_hp = :no_hp,
-                            status = 'proses'
-                        WHERE code = :code
-                    """),
-                    {
-                        "nama": buyer_name_input,
-                        "no_hp": buyer_phone_input,
-                        "code": kode,
-                    }
-                )
+            clear_voucher_cache()
 
             st.success(f"✅ Kupon {kode} berhasil diaktivasi untuk pembeli {buyer_name_input}.")
             aktivasi_notification(
@@ -3181,50 +3639,30 @@ def page_seller_activation():
     st.markdown("---")
     st.subheader("Lacak kupon")
     
-    lacak_code = st.text_input("Masukkan kode kupon").strip().upper()
-    if st.button("Cek Kupon"):
+    # form: ketik kode tidak memicu rerun, hanya saat Cek Kupon ditekan
+    with st.form("lacak_form", clear_on_submit=False):
+        lacak_code = st.text_input("Masukkan kode kupon").strip().upper()
+        cek = st.form_submit_button("Cek Kupon")
+    if cek:
         if not lacak_code:
             st.error("Tidak bisa dilacak, kode belum diinput.")
             return
         else:
-            with engine.connect() as conn:
-                row = conn.execute(text("""
-                    SELECT 
-                        code,
-                        initial_value,
-                        status,
-                        tanggal_aktivasi
-                    FROM public.vouchers
-                    WHERE code = :code
-                    LIMIT 1
-                """), {"code": lacak_code}).fetchone()
+            row = _lookup_voucher(lacak_code)
 
             if not row:
                 st.error("Tidak ada kupon yang ditemukan.")
                 return
             else:
                 code, initial_value, status, tanggal_aktivasi = row
-                if status == "active":
-                    st.success(f"Kupon berkode {code} Rp. {initial_value}, berstatus {status} dengan tanggal aktivasi: {tanggal_aktivasi}.")
-                elif status ==  "proses":
-                    st.info(f"Kupon berkode {code} Rp. {initial_value}, berstatus {status}. Segera bayar kupon agar dapat diaktivasi oleh admin.")
-                elif status == "inavtive" :
-                    st.info(f"Kupon berkode {code} Rp. {initial_value}, berstatus {status}. Aktivasi kupon ditolak oleh admin, hubungi admin untuk info lebih lanjut.")
-                else:
-                    st.info(f"Kupon sedang berstatus {status}.")
+                show, template = LACAK_STATUS.get(status, LACAK_STATUS_LAIN)
+                show(template.format(
+                    code=code,
+                    initial_value=initial_value,
+                    status=status,
+                    tanggal_aktivasi=tanggal_aktivasi,
+                ))
 
-def reset_redeem_state():
-    for key in [
-        "redeem_step",
-        "entered_code",
-        "order_items",
-        "checkout_total",
-        "isvoucher",
-        "voucher_row",
-        "newbal",
-        "show_success"
-    ]:
-        st.session_state.pop(key, None)
 
 SQL_JOIN = text("""
 SELECT
@@ -3248,73 +3686,26 @@ WHERE v.code = :code
 LIMIT 1;
 """)
 
-def validate_voucher_and_show_info(row, total):
-    (
-        code, initial_value, balance, nama, no_hp, status, seller,
-        tanggal_penjualan, tanggal_aktivasi, tunai, jenis_kupon,
-        awal_berlaku, akhir_berlaku
-    ) = row
-
-    today = date.today()
-
-    # --- Validasi masa berlaku (dari jenis_db) ---
-    if awal_berlaku is None or akhir_berlaku is None:
-        st.session_state["redeem_error"] = "⛔ Masa berlaku jenis kupon belum diset."
-        return
-
-    if today < awal_berlaku:
-        st.session_state["redeem_error"] = (
-            f"⛔ Kupon belum dapat digunakan.\n"
-            f"Berlaku mulai: {awal_berlaku}"
-        )
-        return
-
-    if today > akhir_berlaku:
-        st.session_state["redeem_error"] = (
-            f"⛔ Kupon sudah tidak berlaku.\n"
-            f"Masa berlaku berakhir: {akhir_berlaku}"
-        )
-        return
-
-    # --- Validasi status & saldo ---
-    status_normalized = (status or "").strip().lower()
-
-    if status_normalized == "inactive":
-        st.session_state["redeem_error"] = "⛔ Kupon belum aktif."
-        return
-
-    if status_normalized == "habis" or (balance or 0) <= 0:
-        st.session_state["redeem_error"] = "⛔ Saldo kupon sudah habis."
-        return
-
-    if status_normalized == "proses":
-        st.session_state["redeem_error"] = "⛔ Kupon masih belum diaktivasi admin."
-        return
-
-    if status_normalized != "active":
-        st.session_state["redeem_error"] = f"⛔ Status kupon tidak valid: {status}"
-        return
-
-    # --- Validasi tanggal aktivasi & aturan H+1 ---
-    if tanggal_aktivasi is None:
-        st.session_state["redeem_error"] = "⛔ Kupon belum diaktifkan."
-        return
-
-    # SQLAlchemy biasanya sudah date; ini pengaman
-    if hasattr(tanggal_aktivasi, "date"):
-        tgl_aktivasi = tanggal_aktivasi.date()
-    else:
-        try:
-            tgl_aktivasi = datetime.strptime(str(tanggal_aktivasi), "%Y-%m-%d").date()
-        except:
-            tgl_aktivasi = None
+# pesan error per redeem_state dari SEL_VOUCHER (diisi .format(**kolom row))
+REDEEM_ERRORS = {
+    "no_period": "⛔ Masa berlaku jenis kupon belum diset.",
+    "not_yet": "⛔ Kupon belum dapat digunakan.\nBerlaku mulai: {awal_berlaku}",
+    "expired": "⛔ Kupon sudah tidak berlaku.\nMasa berlaku berakhir: {akhir_berlaku}",
+    "inactive": "⛔ Kupon belum aktif.",
+    "empty": "⛔ Saldo kupon sudah habis.",
+    "pending": "⛔ Kupon masih belum diaktivasi admin.",
+    "bad_status": "⛔ Status kupon tidak valid: {status}",
+    "not_activated": "⛔ Kupon belum diaktifkan.",
+    "too_soon": "⛔ Kupon hanya bisa digunakan H+1 setelah aktivasi.",
+}
 
-    if tgl_aktivasi is None:
-        st.session_state["redeem_error"] = "⛔ Format tanggal aktivasi tidak valid."
-        return
+def validate_voucher_and_show_info(row, total):
+    code, initial_value, balance, nama, no_hp = row[:5]
+    jenis_kupon = row.jenis_kupon
 
-    if tgl_aktivasi == today:
-        st.session_state["redeem_error"] = "⛔ Kupon hanya bisa digunakan H+1 setelah aktivasi."
+    # --- Validasi masa berlaku, status, saldo & H+1 (dihitung di SQL) ---
+    if row.redeem_state != "ok":
+        st.session_state["redeem_error"] = REDEEM_ERRORS[row.redeem_state].format(**row._mapping)
         return
 
     # --- Lolos validasi ---
@@ -3323,12 +3714,15 @@ def validate_voucher_and_show_info(row, total):
     st.session_state["redeem_error"] = ""
 
     # --- Tampilkan info voucher ---
-    st.write(f"Kupon: {code}")
-    st.write(f"- Jenis kupon: {jenis_kupon}")
-    st.write(f"- Atas nama: {nama}")
-    st.write(f"- No HP: {no_hp}")
-    st.write(f"- Nilai awal: Rp {int(initial_value):,}")
-    st.write(f"**Sisa Saldo Kupon: Rp {int(balance):,}**")
+    # satu elemen markdown, bukan enam st.write terpisah
+    st.markdown(
+        f"Kupon: {code}\n\n"
+        f"- Jenis kupon: {jenis_kupon}\n"
+        f"- Atas nama: {nama}\n"
+        f"- No HP: {no_hp}\n"
+        f"- Nilai awal: Rp {int(initial_value):,}\n\n"
+        f"**Sisa Saldo Kupon: Rp {int(balance):,}**"
+    )
 
     saldo = int(balance or 0)
     if total > saldo:
@@ -3336,12 +3730,9 @@ def validate_voucher_and_show_info(row, total):
 
 
 # Pastikan session_state ada default (biar gak KeyError)
-if "redeem_error" not in st.session_state:
-    st.session_state["redeem_error"] = ""
-if "isvoucher" not in st.session_state:
-    st.session_state["isvoucher"] = "no"
-if "voucher_row" not in st.session_state:
-    st.session_state["voucher_row"] = None
+st.session_state.setdefault("redeem_error", "")
+st.session_state.setdefault("isvoucher", "no")
+st.session_state.setdefault("voucher_row", None)
 
 if st.session_state.get("redeem_error"):
     st.error(st.session_state["redeem_error"])
@@ -3358,26 +3749,65 @@ st.set_page_config(
     initial_sidebar_state="expanded" 
 )
 
+@st.cache_resource
+def _load_fonts():
+    # font struk diparse sekali per proses, bukan tiap struk dibuat
+    try:
+        return (
+            ImageFont.truetype("arial.ttf", 24),
+            ImageFont.truetype("arial.ttf", 18),
+            ImageFont.truetype("arialbd.ttf", 18),
+        )
+    except OSError:
+        default = ImageFont.load_default()
+        return default, default, default
+
+RECEIPT_LINE = 25
+
+def _receipt_height(receipt):
+    """
+    Tinggi struk persis, dihitung dari langkah y yang sama dengan
+    create_receipt_image (ubah keduanya bersamaan).
+    """
+    lh = RECEIPT_LINE
+    y = 20 + 35 + lh + (lh + 10) + 15           # header + garis
+    y += len(receipt['cart']) * (lh + lh + 5)   # 2 baris per item
+    y += 10 + 15 + lh                           # garis + subtotal
+    if receipt['diskon_manual'] > 0:
+        y += lh
+    if receipt['voucher_amt'] > 0:
+        y += lh
+    y += 10 + lh + 20                           # total bayar
+    if receipt.get("voucher_details"):
+        y += 15 + 4 * lh
+        if receipt.get('sisa_saldo_voucher') is not None:
+            y += lh
+        y += 10
+    return y + 20 + 40                          # penutup
+
 def create_receipt_image(receipt):
-    W, H = 500, 800
+    W = 500
     bg_color = "white"
     text_color = "black"
     
-    try:
-        font_large = ImageFont.truetype("arial.ttf", 24)
-        font_reg = ImageFont.truetype("arial.ttf", 18)
-        font_bold = ImageFont.truetype("arialbd.ttf", 18)
-    except:
-        font_large = ImageFont.load_default()
-        font_reg = ImageFont.load_default()
-        font_bold = ImageFont.load_default()
-
-    image = Image.new("RGB", (W, H), bg_color)
+    font_large, font_reg, font_bold = _load_fonts()
+
+    # field struk diambil sekali di awal
+    cart = receipt['cart']
+    subtotal = receipt['subtotal']
+    diskon = receipt['diskon_manual']
+    voucher_amt = receipt['voucher_amt']
+    total_final = receipt['total_final']
+    vd = receipt.get("voucher_details")
+    sisa = receipt.get('sisa_saldo_voucher')
+
+    # kanvas langsung setinggi struk: tanpa crop & tanpa batas 800px
+    image = Image.new("RGB", (W, _receipt_height(receipt)), bg_color)
     draw = ImageDraw.Draw(image)
 
     y = 20
     margin = 20
-    line_height = 25
+    line_height = RECEIPT_LINE
 
     draw.text((W//2, y), "PAWON SAPPITOE", fill=text_color, anchor="ms", font=font_large)
     y += 35
@@ -3389,48 +3819,42 @@ def create_receipt_image(receipt):
     draw.line([(margin, y), (W-margin, y)], fill="black", width=2)
     y += 15
 
-    for item in receipt['cart']:
+    # angka rata kanan pakai anchor "ra" (right-ascender), tanpa textbbox per baris
+    x_right = W - margin
+    for item in cart:
         draw.text((margin, y), item['nama'], fill=text_color, font=font_bold)
         y += line_height
         qty_price = f"{item['qty']} x {item['harga_satuan']:,}"
         draw.text((margin, y), qty_price, fill="gray", font=font_reg)
-        total_str = f"{item['total']:,}"
-        bbox = draw.textbbox((0, 0), total_str, font=font_bold)
-        text_width = bbox[2] - bbox[0]
-        draw.text((W - margin - text_width, y), total_str, fill=text_color, font=font_bold)
+        draw.text((x_right, y), f"{item['total']:,}", fill=text_color, anchor="ra", font=font_bold)
         y += line_height + 5
 
     y += 10
     draw.line([(margin, y), (W-margin, y)], fill="black", width=2)
     y += 15
 
-    def draw_row(label, value, color="black", is_bold=False):
-        fnt = font_bold if is_bold else font_reg
-        draw.text((margin, y), label, fill=color, font=fnt)
-        val_str = f"{value:,}" if isinstance(value, int) else str(value)
-        bbox = draw.textbbox((0, 0), val_str, font=fnt)
-        t_w = bbox[2] - bbox[0]
-        draw.text((W - margin - t_w, y), val_str, fill=color, font=fnt)
-
-    draw_row("Subtotal", receipt['subtotal'])
-    y += line_height
+    # baris ringkasan: (label, teks nilai, warna), diformat sekali di sini
+    rows = [("Subtotal", f"{subtotal:,}" if isinstance(subtotal, int) else str(subtotal), "black")]
+    if diskon > 0:
+        rows.append(("Diskon", f"- {diskon:,}", "red"))
+    if voucher_amt > 0:
+        rows.append(("Voucher", f"- {voucher_amt:,}", "blue"))
 
-    if receipt['diskon_manual'] > 0:
-        draw_row("Diskon", f"- {receipt['diskon_manual']:,}", color="red")
-        y += line_height
+    def draw_row(label, val_str, color="black", fnt=font_reg):
+        draw.text((margin, y), label, fill=color, font=fnt)
+        draw.text((x_right, y), val_str, fill=color, anchor="ra", font=fnt)
 
-    if receipt['voucher_amt'] > 0:
-        draw_row("Voucher", f"- {receipt['voucher_amt']:,}", color="blue")
+    for label, val_str, color in rows:
+        draw_row(label, val_str, color)
         y += line_height
 
     y += 10
-    draw_row("TOTAL BAYAR", f"Rp {receipt['total_final']:,}", is_bold=True)
+    draw_row("TOTAL BAYAR", f"Rp {total_final:,}", fnt=font_bold)
     y += line_height + 20
 
-    if receipt.get("voucher_details"):
+    if vd:
         draw.line([(margin, y), (W-margin, y)], fill="gray", width=1)
         y += 15
-        vd = receipt["voucher_details"]
         draw.text((margin, y), "INFO VOUCHER:", fill="black", font=font_bold)
         y += line_height
         draw.text((margin, y), f"Kode : {vd['code']}", fill="black", font=font_reg)
@@ -3439,9 +3863,8 @@ def create_receipt_image(receipt):
         y += line_height
         draw.text((margin, y), f"HP   : {vd['hp']}", fill="gray", font=font_reg)
         y += line_height
-        if receipt.get('sisa_saldo_voucher') is not None:
-            sisa = int(receipt['sisa_saldo_voucher'])
-            draw.text((margin, y), f"Sisa Saldo : Rp {sisa:,}", fill="black", font=font_bold)
+        if sisa is not None:
+            draw.text((margin, y), f"Sisa Saldo : Rp {int(sisa):,}", fill="black", font=font_bold)
             y += line_height
         y += 10
 
@@ -3449,153 +3872,116 @@ def create_receipt_image(receipt):
     draw.text((W//2, y), "*** TERIMA KASIH ***", fill=text_color, anchor="ms", font=font_reg)
     y += 40
 
-    final_image = image.crop((0, 0, W, y))
     img_byte_arr = io.BytesIO()
-    final_image.save(img_byte_arr, format='PNG')
+    # dipakai langsung (tampil & unduh), kompresi ringan sudah cukup
+    image.save(img_byte_arr, format='PNG', optimize=False, compress_level=1)
     img_byte_arr = img_byte_arr.getvalue()
     return img_byte_arr
 
 def apply_custom_css():
-    st.markdown("""
-    <style>
-        /* =============================================
-           1. SETUP TAMPILAN DASAR (Background Putih)
-           ============================================= */
-        .stApp { 
-            background-color: #f8fafc !important; 
-        }
-        
-        /* Default teks hitam/gelap untuk paragraf biasa */
-        h1, h2, h3, h4, h5, h6, p, span, li, div {
-            color: #1e293b;
-        }
+    # CSS halaman kasir ada di static/kasir_theme.css, dibaca lewat cache yang
+    # sama dengan tema login; tetap dikirim tiap rerun supaya tidak hilang
+    render_html(_load_css(str(KASIR_CSS_PATH), os.path.getmtime(KASIR_CSS_PATH)))
+
+# Kartu menu + input qty kasir; qty disimpan ke st.session_state.order_items
+def render_menu_grid(items_to_show, key_suffix):
+    if not items_to_show:
+        st.info("Menu tidak ditemukan.")
+        return
+    
+    cols = st.columns(3) 
+    for idx, item in enumerate(items_to_show):
+        with cols[idx % 3]:
+            # A. TAMPILAN CARD (HTML/CSS)
+            st.markdown(f"""
+            <div class="menu-card">
+                <div>
+                    <div class="card-header">
+                        <span class="badge-cat">{item['kategori']}</span>
+                    </div>
+                    <div class="menu-name">{item['nama']}</div>
+                    <div class="menu-price">Rp {item['harga']:,}</div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # B. INPUT JUMLAH (QTY)
+            id_menu = item["id_menu"]
+            old_val = st.session_state.order_items.get(id_menu, 0)
 
-        /* Sidebar Background Putih */
-        section[data-testid="stSidebar"] {
-            background-color: #ffffff !important;
-            border-right: 1px solid #e2e8f0;
-        }
+            if item["satuan"] == "kg":
+                qty = st.number_input(
+                    f"qty_{id_menu}",
+                    min_value=0.0,
+                    value=float(old_val),
+                    step=0.1,
+                    format="%.2f",
+                    label_visibility="collapsed",
+                    key=f"inp_{id_menu}_{key_suffix}"
+                )
+            else:
+                qty = st.number_input(
+                    f"qty_{id_menu}",
+                    min_value=0,
+                    value=int(old_val),
+                    step=1,
+                    label_visibility="collapsed",
+                    key=f"inp_{id_menu}_{key_suffix}"
+                )
 
-        /* =============================================
-           2. INPUT FIELD (Cari, Qty, Kupon) - TIDAK DIUBAH
-           ============================================= */
-        /* Background Kotak Input Putih */
-        div[data-baseweb="input"], div[data-baseweb="base-input"] {
-            background-color: #ffffff !important;
-            border: 1px solid #cbd5e1 !important;
-            border-radius: 8px !important;
-        }
-        /* Tulisan yang diketik HITAM */
-        input[type="text"], input[type="number"], input[type="password"] {
-            color: #333333 !important;
-            -webkit-text-fill-color: #333333 !important; 
-        }
+            # ⬅️ SIMPAN TANPA int()
+            st.session_state.order_items[id_menu] = qty
 
-        /* =============================================
-           3. SEMUA TOMBOL (FIX: BIRU & TULISAN PUTIH)
-           ============================================= */
-        
-        /* A. TOMBOL SIDEBAR (Navigasi) */
-        section[data-testid="stSidebar"] button {
-            background-color: #3b82f6 !important; /* Biru */
-            color: #ffffff !important;            /* PUTIH MUTLAK */
-            border: none !important;
-            border-radius: 8px !important;
-            height: 45px !important;
-            font-weight: 600 !important;
-            margin-bottom: 8px !important;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1) !important;
-        }
-        /* Saat kursor diarahkan ke tombol sidebar */
-        section[data-testid="stSidebar"] button:hover {
-            background-color: #2563eb !important;
-            color: #ffffff !important; /* Tetap Putih */
-        }
-        /* Khusus teks di dalam tombol sidebar dipaksa putih */
-        section[data-testid="stSidebar"] button p {
-            color: #ffffff !important;
-        }
+@st.fragment
+def _menu_fragment(menu_items):
+    """
+    Pencarian + grid menu + total (langkah 1 kasir). Ubah qty hanya
+    me-rerun fragment ini; Lanjut Bayar me-rerun seluruh halaman.
+    """
+    # --- 2. SEARCH BAR UI ---
+    col_search, _ = st.columns([2, 1]) 
+    with col_search:
+        search_query = st.text_input("🔍 Cari Menu", placeholder="Ketik nama menu...").strip().lower()
+    
+    st.write("") # Jarak dikit biar rapi
 
-        /* B. TOMBOL BIASA (Kembali, Cek Kupon, dll) */
-        div[data-testid="stButton"] button {
-            background-color: #3b82f6 !important; /* Biru */
-            color: #ffffff !important;            /* PUTIH MUTLAK */
-            border: none !important;
-            border-radius: 8px !important;
-            font-weight: 600 !important;
-        }
-        div[data-testid="stButton"] button:hover {
-            background-color: #2563eb !important;
-            color: #ffffff !important;
-            box-shadow: 0 4px 6px rgba(59, 130, 246, 0.4);
-        }
-        /* Khusus teks di dalam tombol biasa dipaksa putih */
-        div[data-testid="stButton"] button p {
-            color: #ffffff !important;
-        }
+    if search_query:
+        filtered_search = [m for m in menu_items if search_query in m["nama_lower"]]
+        st.caption(f"Hasil pencarian: {len(filtered_search)} menu")
+        render_menu_grid(filtered_search, "search_mode")
+    
+    else:
+        categories = sorted({item["kategori"] for item in menu_items}) 
+        tabs = st.tabs(categories)
 
-        /* C. TOMBOL PROSES (Primary) */
-        button[kind="primary"] {
-            background-color: #dc2626 !important; /* Merah/Sesuai selera */
-            color: #ffffff !important;
-        }
-        button[kind="primary"] p {
-            color: #ffffff !important;
-        }
+        for i, tab_name in enumerate(categories):
+            with tabs[i]:
+                # Filter menu yang kategorinya sesuai tab ini saja
+                filtered_tab = [m for m in menu_items if m["kategori"] == tab_name]
+                render_menu_grid(filtered_tab, "tab_mode")
 
-        /* =============================================
-           4. CARD MENU (TIDAK DIUBAH - SESUAI PERMINTAAN)
-           ============================================= */
-        /* --- MENU CARD DESIGN (Shadow & Hover) --- */
-        .menu-card {
-            background-color: white;
-            border-radius: 12px;
-            padding: 15px;
-            box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
-            border: 1px solid #e2e8f0;
-            height: 100%;
-            transition: transform 0.2s, box-shadow 0.2s;
-            display: flex;
-            flex-direction: column;
-            justify-content: space-between;
-        }
-        
-        .menu-card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 15px -3px rgba(59, 130, 246, 0.3);
-            border-color: #3b82f6;
-        }
 
-        .card-header {
-            display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 8px;
-        }
-        .badge-cat {
-            background-color: #dbeafe; color: #1e40af; font-size: 0.7rem;
-            padding: 2px 8px; border-radius: 99px; font-weight: bold; text-transform: uppercase;
-        }
-        .menu-name {
-            font-size: 1.1rem; font-weight: 700; color: #1e293b; margin-bottom: 5px; line-height: 1.2;
-        }
-        .menu-price {
-            font-size: 1rem; color: #059669; font-weight: 800; margin-bottom: 10px;
-        }
+    menu_index = get_menu_index(st.session_state.selected_branch)
+    total_sementara = sum(
+        menu_index[k][1] * v
+        for k, v in st.session_state.order_items.items()
+        if k in menu_index
+    )
+    
+    if total_sementara > 0:
+        st.markdown("---")
+        st.success(f"💰 Total Sementara: **Rp {total_sementara:,}**")
         
-        /* Modifikasi Tabs agar lebih bersih */
-        .stTabs [data-baseweb="tab-list"] { gap: 10px; background-color: transparent; }
-        .stTabs [data-baseweb="tab"] {
-            background-color: white; border-radius: 8px 8px 0 0; border: 1px solid #e2e8f0; padding: 10px 20px;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: #3b82f6 !important; color: white !important; border: none;
-        }
-
-    </style>
-    """, unsafe_allow_html=True)
+        if st.button("Lanjut Bayar ➡️", type="primary", use_container_width=True):
+            st.session_state.redeem_step = 2
+            st.rerun()
 
 def page_kasir():
     apply_custom_css()
-    if "active_page" not in st.session_state: 
-        st.session_state.active_page = "Pemesanan"
+    if "flash_toast" in st.session_state:
+        msg, icon = st.session_state.pop("flash_toast")
+        st.toast(msg, icon=icon)
+    st.session_state.setdefault("active_page", "Pemesanan")
 
     with st.sidebar:
             st.title("NAVIGASI")
@@ -3618,11 +4004,9 @@ def page_kasir():
         st.header("Kasir / Transaksi")
         
         # Init State (Logika Asli)
-        if "redeem_step" not in st.session_state: st.session_state.redeem_step = 1
-        if "entered_code" not in st.session_state: st.session_state.entered_code = ""
-        if "order_items" not in st.session_state: st.session_state.order_items = {} 
-        if "diskon" not in st.session_state: st.session_state.diskon = 0
-        if "isvoucher" not in st.session_state: st.session_state.isvoucher = "no"
+        for k, v in {"redeem_step": 1, "entered_code": "", "order_items": {},
+                     "diskon": 0, "isvoucher": "no"}.items():
+            st.session_state.setdefault(k, v)
        
         if st.session_state.redeem_step == 1:
             if "redeem_error" in st.session_state: del st.session_state["redeem_error"]
@@ -3639,6 +4023,7 @@ def page_kasir():
                         menu_items.append({
                             "id_menu": int(it["id_menu"]),
                             "nama": str(it["nama"]),
+                            "nama_lower": it["nama_lower"],
                             "kategori": str(it.get("kategori", "Lainnya")),
                             "harga": (it["harga"]),
                             "satuan": it["satuan"]
@@ -3650,103 +4035,21 @@ def page_kasir():
                 st.stop()
 
 
-            # --- 2. SEARCH BAR UI ---
-            col_search, _ = st.columns([2, 1]) 
-            with col_search:
-                search_query = st.text_input("🔍 Cari Menu", placeholder="Ketik nama menu...").strip().lower()
-            
-            st.write("") # Jarak dikit biar rapi
-
-            # --- 3. FUNGSI RENDER GRID (HELPER) ---
-            # Fungsi ini dibuat biar kita gak nulis kode HTML Card berulang-ulang
-            def render_grid(items_to_show, key_suffix):
-                if not items_to_show:
-                    st.info("Menu tidak ditemukan.")
-                    return
-                
-                cols = st.columns(3) 
-                for idx, item in enumerate(items_to_show):
-                    with cols[idx % 3]:
-                        # A. TAMPILAN CARD (HTML/CSS)
-                        st.markdown(f"""
-                        <div class="menu-card">
-                            <div>
-                                <div class="card-header">
-                                    <span class="badge-cat">{item['kategori']}</span>
-                                </div>
-                                <div class="menu-name">{item['nama']}</div>
-                                <div class="menu-price">Rp {item['harga']:,}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # B. INPUT JUMLAH (QTY)
-                        id_menu = item["id_menu"]
-                        old_val = st.session_state.order_items.get(id_menu, 0)
-
-                        if item["satuan"] == "kg":
-                            qty = st.number_input(
-                                f"qty_{id_menu}",
-                                min_value=0.0,
-                                value=float(old_val),
-                                step=0.1,
-                                format="%.2f",
-                                label_visibility="collapsed",
-                                key=f"inp_{id_menu}_{key_suffix}"
-                            )
-                        else:
-                            qty = st.number_input(
-                                f"qty_{id_menu}",
-                                min_value=0,
-                                value=int(old_val),
-                                step=1,
-                                label_visibility="collapsed",
-                                key=f"inp_{id_menu}_{key_suffix}"
-                            )
-
-                        # ⬅️ SIMPAN TANPA int()
-                        st.session_state.order_items[id_menu] = qty
-                        st.write("") # Spacer bawah card
-
-            if search_query:
-                filtered_search = [m for m in menu_items if search_query in m["nama"].lower()]
-                st.caption(f"Hasil pencarian: {len(filtered_search)} menu")
-                render_grid(filtered_search, "search_mode")
-            
-            else:
-                categories = sorted({item["kategori"] for item in menu_items}) 
-                tabs = st.tabs(categories)
-
-                for i, tab_name in enumerate(categories):
-                    with tabs[i]:
-                        # Filter menu yang kategorinya sesuai tab ini saja
-                        filtered_tab = [m for m in menu_items if m["kategori"] == tab_name]
-                        render_grid(filtered_tab, "tab_mode")
-
-
-            price_map = {m["id_menu"]: m["harga"] for m in menu_items}
-            total_sementara = sum(price_map.get(k,0)*v for k,v in st.session_state.order_items.items())
-            
-            if total_sementara > 0:
-                st.markdown("---")
-                st.success(f"💰 Total Sementara: **Rp {total_sementara:,}**")
-                
-                if st.button("Lanjut Bayar ➡️", type="primary", use_container_width=True):
-                    st.session_state.redeem_step = 2
-                    st.rerun()
+            # grid menu & total dalam fragment sendiri
+            _menu_fragment(menu_items)
 
         elif st.session_state.redeem_step == 2:
-            menu_db = get_menu_from_db(st.session_state.selected_branch)
-            price_map = {m["id_menu"]: float(m["harga"]) for m in menu_db}
-            name_map = {m["id_menu"]: m["nama"] for m in menu_db}
-            
+            menu_index = get_menu_index(st.session_state.selected_branch)
+
             cart_list = []
             subtotal = 0
             for pid, qty in st.session_state.order_items.items():
-                if qty > 0 and pid in price_map:
-                    tot = price_map[pid] * qty
+                if qty > 0 and pid in menu_index:
+                    nama, harga = menu_index[pid]
+                    harga = float(harga)
+                    tot = harga * qty
                     subtotal += tot
-                    cart_list.append({"nama": name_map[pid], "qty": qty, "harga_satuan": price_map[pid], "total": tot})
+                    cart_list.append({"nama": nama, "qty": qty, "harga_satuan": harga, "total": tot})
 
             if not cart_list:
                 st.session_state.redeem_step = 1
@@ -3764,10 +4067,13 @@ def page_kasir():
             with c2:
                 st.subheader("💳 Pembayaran")
 
-                code_in = st.text_input("Kode Kupon", value=st.session_state.entered_code).strip().upper()
+                # ketik kode + cek = satu rerun (form), bukan dua
+                with st.form("kupon_form", border=False):
+                    code_in = st.text_input("Kode Kupon", value=st.session_state.entered_code).strip().upper()
+                    cek_kupon = st.form_submit_button("Cek Kupon")
                 st.session_state.entered_code = code_in
 
-                if st.button("Cek Kupon"):
+                if cek_kupon:
                     # reset dulu
                     st.session_state.isvoucher = "no"
                     st.session_state.voucher_row = None
@@ -3825,6 +4131,7 @@ def page_kasir():
 
                     
                     if ok:
+                        clear_voucher_cache()
                         transaksi_notification(
                             date.today(),
                             st.session_state.selected_branch,
@@ -3883,22 +4190,15 @@ def page_kasir():
         cabang = st.session_state.get("cabang", "Semua")
     
         # kalau mau hanya cabang kasir + yang belum locked
-        df_tx = list_transactions_draft(engine, tanggal=None, branch=cabang)
+        # normalisasi (COALESCE / angka) sudah dikerjakan di query
+        df_tx = list_riwayat_draft(engine, branch=cabang)
     
         if df_tx.empty:
             st.info("Belum ada transaksi.")
             st.stop()
     
-        # normalisasi ringan
-        df_tx["tanggal_transaksi"] = pd.to_datetime(df_tx["tanggal_transaksi"], errors="coerce").dt.date
-        df_tx["isvoucher"] = df_tx.get("isvoucher", "").fillna("no")
-        df_tx["code"] = df_tx.get("code", "").fillna("")
-        df_tx["diskon"] = pd.to_numeric(df_tx.get("diskon", 0), errors="coerce").fillna(0)
-        df_tx["used_amount"] = pd.to_numeric(df_tx.get("used_amount", 0), errors="coerce").fillna(0)
-        df_tx["tunai"] = pd.to_numeric(df_tx.get("tunai", 0), errors="coerce").fillna(0)
-    
         st.dataframe(
-            df_tx[["id","tanggal_transaksi","branch","items","used_amount","tunai","isvoucher","code","diskon"]],
+            df_tx,
             use_container_width=True,
             height=450
         )